@@ -0,0 +1,42 @@
+"""Confirms that debug logging on the message hot path costs effectively nothing while it is disabled.
+
+Compares the per-call cost of a guarded and an unguarded debug message, and the wall-clock time of a simulation with
+debug logging disabled against one with logging disabled altogether.
+
+Usage: python -m benchmarks.logging_overhead
+"""
+import logging
+import random
+import time
+import timeit
+
+from benchmarks.run_modes import build_simulation
+
+N = 1_000_000
+UNTIL = 200_000
+
+logger = logging.getLogger("benchmark")
+logger.setLevel(logging.INFO)
+
+
+def _simulation_time() -> float:
+    random.seed(0)
+    simulation = build_simulation(n_sensors=2)
+    start = time.perf_counter()
+    simulation.run(until=UNTIL, progress_bar=False, fast=True)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    path = [object() for _ in range(4)]
+    unguarded = timeit.timeit(lambda: logger.debug(f"Sending message via path {path}."), number=N)
+    guarded = timeit.timeit(lambda: logger.isEnabledFor(logging.DEBUG) and logger.debug(f"Sending message via path {path}."), number=N)
+    print(f"unguarded debug call: {unguarded / N * 1e9:>8.0f} ns")
+    print(f"guarded debug call:   {guarded / N * 1e9:>8.0f} ns")
+
+    logging.getLogger("pyfogsim").setLevel(logging.WARNING)
+    debug_off = min(_simulation_time() for _ in range(5))
+    logging.disable(logging.CRITICAL)
+    logging_off = min(_simulation_time() for _ in range(5))
+    print(f"simulation, debug logging off: {debug_off:.3f} s")
+    print(f"simulation, all logging off:   {logging_off:.3f} s ({(debug_off / logging_off - 1) * 100:+.1f}%)")
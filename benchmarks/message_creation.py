@@ -0,0 +1,43 @@
+"""Measures how many messages per second can be created from a template, comparing the former
+`copy`-based `Message.evolve` with the slotted `Message.create`.
+
+Usage: python -m benchmarks.message_creation
+"""
+import timeit
+from copy import copy
+
+from pyfogsim.application import Message
+
+N = 1_000_000
+
+
+class LegacyMessage:
+    """Replica of the former `Message` implementation"""
+
+    def __init__(self, name, dst, instructions=0, size=0):
+        self.name = name
+        self.dst = dst
+        self.instructions = instructions
+        self.size = size
+        self.created = None
+        self.network_queue = None
+        self.network_latency = None
+        self.operator_queue = None
+        self.operator_processing = None
+        self.application = None
+
+    def evolve(self, **kwargs):
+        message = copy(self)
+        for key, value in kwargs.items():
+            setattr(message, key, value)
+        return message
+
+
+if __name__ == "__main__":
+    legacy = LegacyMessage("legacy", dst=None, instructions=30, size=1000)
+    template = Message("template", dst=None, instructions=30, size=1000)
+    before = timeit.timeit(lambda: legacy.evolve(created=1.0, application=None), number=N)
+    after = timeit.timeit(lambda: template.create(1.0, None), number=N)
+    print(f"before (copy + setattr): {N / before:>12,.0f} messages/s")
+    print(f"after  (slotted create): {N / after:>12,.0f} messages/s")
+    print(f"speedup:                 {before / after:>12.1f}x")
@@ -0,0 +1,57 @@
+"""Measures the solve time of the `OptimizedPlacement` methods for an increasing number of applications.
+
+Every 100 sensors share a fog node, all fog nodes are connected to a single cloud.
+
+Usage: python -m benchmarks.placement_solve_time
+"""
+import time
+
+import networkx as nx
+
+from pyfogsim.application import Application, Message, Sink, Source, Operator
+from pyfogsim.distribution import UniformDistribution
+from pyfogsim.placement import LatencyModel
+from pyfogsim.resource import Cloud, Fog, Sensor, Link4G, LinkCable
+
+N_APPS = [100, 1000, 10000]
+SENSORS_PER_FOG = 100
+ITERATIONS = 1000
+
+
+def _network(n_sensors: int) -> nx.Graph:
+    G = nx.Graph()
+    cloud = Cloud("cloud")
+    fogs = [Fog(str(i)) for i in range(max(n_sensors // SENSORS_PER_FOG, 1))]
+    for fog in fogs:
+        G.add_edge(fog, cloud, link=LinkCable())
+    for i in range(n_sensors):
+        G.add_edge(Sensor(str(i)), fogs[i % len(fogs)], link=Link4G())
+    return G
+
+
+def _apps(G: nx.Graph):
+    cloud = next(n for n in G if isinstance(n, Cloud))
+    for sensor in [n for n in G if isinstance(n, Sensor)]:
+        sink = Sink(f"{sensor.name}:sink", node=cloud)
+        operator = Operator(f"{sensor.name}:operator", message_out=Message("operator->sink", dst=sink, instructions=50, size=50))
+        message = Message("source->operator", dst=operator, instructions=30, size=1000)
+        source = Source(f"{sensor.name}:source", node=sensor, message_out=message, distribution=UniformDistribution(min=100, max=400))
+        yield Application(sensor.name, source=source, operators=[operator], sink=sink)
+
+
+if __name__ == "__main__":
+    print(f"{'apps':>8} {'model [s]':>10} {'greedy [s]':>11} {'annealing [s]':>14} {'greedy latency':>15} {'annealing latency':>18}")
+    for n_apps in N_APPS:
+        G = _network(n_apps)
+        apps = list(_apps(G))
+        start = time.perf_counter()
+        model = LatencyModel(G, apps, candidates=[n for n in G if not isinstance(n, Sensor)])
+        model_time = time.perf_counter() - start
+        start = time.perf_counter()
+        x = model.greedy()
+        greedy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        y = model.anneal(x, iterations=ITERATIONS, seed=0)
+        annealing_time = time.perf_counter() - start
+        print(f"{n_apps:>8} {model_time:>10.3f} {greedy_time:>11.3f} {annealing_time:>14.3f} "
+              f"{model.expected_latency(x):>15.3f} {model.expected_latency(y):>18.3f}")
@@ -0,0 +1,58 @@
+"""Compares the wall-clock time of the stepped and the fast run mode of `Simulation.run` for increasing horizons.
+
+Usage: python -m benchmarks.run_modes
+"""
+import random
+import time
+
+import networkx as nx
+
+from pyfogsim.application import Application, Message, Sink, Source, Operator
+from pyfogsim.core import Simulation
+from pyfogsim.distribution import UniformDistribution
+from pyfogsim.placement import EdgePlacement
+from pyfogsim.resource import Cloud, Fog, Sensor, Link4G, LinkCable
+from pyfogsim.selection import ShortestPath
+
+HORIZONS = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+N_SENSORS = 2
+
+
+def _network(n_sensors: int) -> nx.Graph:
+    G = nx.Graph()
+    cloud = Cloud("cloud")
+    fog = Fog("fog")
+    G.add_edge(fog, cloud, link=LinkCable())
+    for i in range(n_sensors):
+        G.add_edge(Sensor(str(i)), fog, link=Link4G())
+    return G
+
+
+def build_simulation(n_sensors: int) -> Simulation:
+    G = _network(n_sensors)
+    simulation = Simulation(G, selection=ShortestPath(routing_table=True))
+    cloud = next(n for n in G if isinstance(n, Cloud))
+    for sensor in [n for n in G if isinstance(n, Sensor)]:
+        sink = Sink(f"{sensor.name}:sink", node=cloud)
+        operator = Operator(f"{sensor.name}:operator", message_out=Message("operator->sink", dst=sink, instructions=50, size=50))
+        message = Message("source->operator", dst=operator, instructions=30, size=1000)
+        source = Source(f"{sensor.name}:source", node=sensor, message_out=message, distribution=UniformDistribution(min=100, max=400))
+        simulation.deploy_app(Application(sensor.name, source=source, operators=[operator], sink=sink))
+    simulation.deploy_placement(EdgePlacement(apps=simulation.apps))
+    return simulation
+
+
+def _measure(until: int, **kwargs) -> float:
+    random.seed(0)
+    simulation = build_simulation(N_SENSORS)
+    start = time.perf_counter()
+    simulation.run(until=until, progress_bar=False, **kwargs)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print(f"{'until':>10} {'stepped [s]':>12} {'fast [s]':>10} {'speedup':>8}")
+    for until in HORIZONS:
+        stepped = _measure(until)
+        fast = _measure(until, fast=True)
+        print(f"{until:>10} {stepped:>12.3f} {fast:>10.3f} {stepped / fast:>7.1f}x")
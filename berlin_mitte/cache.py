@@ -0,0 +1,103 @@
+"""Persistent cache for generated Berlin Mitte networks.
+
+Networks are stored as a plain node-link description and keyed by their parameters, the generator version and a hash of
+the GeoJSON resources, so changing any of them transparently regenerates the network. The `Node` and `Link` objects are
+rebuilt from the description on every load, so changes to their classes never break or leak into the cache.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+from typing import Optional, Dict, Any
+
+import networkx as nx
+
+from berlin_mitte.generate_network import generate_network, generate_network_vectorized, GENERATOR_VERSION, DC_GEOJSON, FOG_GEOJSON, MITTE_GEOJSON
+from pyfogsim.resource import Sensor, Fog, Cloud, Link4G, LinkCable
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache")
+
+NODE_KINDS = {cls.__name__: cls for cls in (Sensor, Fog, Cloud)}
+LINK_KINDS = {cls.__name__: cls for cls in (Link4G, LinkCable)}
+NODE_ATTRIBUTES = ("ipt", "ram", "watt_idle", "watt_load", "cores")
+LINK_ATTRIBUTES = ("bandwidth", "latency", "watt_idle", "watt_load")
+
+
+def load_network(n_sensors: int, n_fog: Optional[int] = None, seed: int = 0, vectorized: bool = True, cache_dir: str = CACHE_DIR) -> nx.Graph:
+    """Returns the network for the given parameters, from the cache if possible.
+
+    Every call returns new `Node` and `Link` objects, so the network can be used for a new simulation right away.
+
+    Args:
+        n_sensors: Number of sensors
+        n_fog: Maximum number of fog nodes
+        seed: Random seed used to generate the network
+        vectorized: Use `generate_network_vectorized` instead of `generate_network`
+        cache_dir: Directory of the cache
+    """
+    generator = "vectorized" if vectorized else "default"
+    key = f"{n_sensors}-{n_fog}-{seed}-{generator}-v{GENERATOR_VERSION}-{_resources_hash()}"
+    path = os.path.join(cache_dir, f"network-{key}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return _build(json.load(f))
+
+    logger.info(f"Generating network {key}.")
+    if vectorized:
+        network = generate_network_vectorized(n_sensors, n_fog, seed=seed)
+    else:
+        state = random.getstate()
+        random.seed(seed)
+        network = generate_network(n_sensors, n_fog)
+        random.setstate(state)
+
+    description = _describe(network)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(description, f)
+    os.replace(path + ".tmp", path)
+    # Built from the description, so a fresh and a cached network have the same node and neighbor order
+    return _build(description)
+
+
+def _describe(network: nx.Graph) -> Dict[str, Any]:
+    """Plain node-link description of *network*, nodes are referenced by their index"""
+    index = {node: i for i, node in enumerate(network.nodes)}
+    nodes = [
+        {"kind": type(node).__name__, "name": node.name, "pos": list(pos), **{a: getattr(node, a) for a in NODE_ATTRIBUTES}}
+        for node, pos in network.nodes(data="pos")
+    ]
+    links = [
+        {"kind": type(link).__name__, "source": index[u], "target": index[v], **{a: getattr(link, a) for a in LINK_ATTRIBUTES}}
+        for u, v, link in network.edges(data="link")
+    ]
+    return {"nodes": nodes, "links": links}
+
+
+def _build(description: Dict[str, Any]) -> nx.Graph:
+    """Creates the network of a description returned by `_describe`"""
+    network = nx.Graph()
+    nodes = []
+    for data in description["nodes"]:
+        node = NODE_KINDS[data["kind"]](data["name"])
+        for attribute in NODE_ATTRIBUTES:
+            setattr(node, attribute, data[attribute])
+        network.add_node(node, pos=tuple(data["pos"]))
+        nodes.append(node)
+    for data in description["links"]:
+        link = LINK_KINDS[data["kind"]]()
+        for attribute in LINK_ATTRIBUTES:
+            setattr(link, attribute, data[attribute])
+        network.add_edge(nodes[data["source"]], nodes[data["target"]], link=link)
+    return network
+
+
+def _resources_hash() -> str:
+    sha = hashlib.sha1()
+    for path in (DC_GEOJSON, FOG_GEOJSON, MITTE_GEOJSON):
+        with open(path, "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()[:12]
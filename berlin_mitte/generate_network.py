@@ -5,6 +5,8 @@ from typing import Optional, Dict, List
 
 import geojson
 import networkx as nx
+import numpy as np
+import shapely
 from shapely.geometry import shape, Point
 
 from pyfogsim.resource import Fog, Sensor, Link4G, LinkCable, Cloud
@@ -16,14 +18,59 @@ FOG_GEOJSON = os.path.join(result_dir, "fog.geo.json")
 MITTE_GEOJSON = os.path.join(result_dir, "mitte.geo.json")
 
 
-def generate_network(n_sensors: int, n_fog: Optional[int] = None) -> nx.Graph:
-    with open(MITTE_GEOJSON) as stream:
-        mitte = shape(geojson.load(stream)["geometry"])
+GENERATOR_VERSION = 2  # Increment on every change which alters the generated networks or their classes, this invalidates all cached networks
+
+SENSOR_CENTER = (13.39, 52.522297)
+SENSOR_SIGMA = 0.03
+SENSOR_RADIUS = 0.015
 
+
+def generate_network(n_sensors: int, n_fog: Optional[int] = None) -> nx.Graph:
+    mitte = _mitte()
     dc_nodes = _dc_nodes()
     nodes_fog = _fog_nodes(n_fog)
-
     sensor_nodes, sensor_edge_lists = zip(*islice(_sensor_nodes(mitte, nodes_fog), n_sensors))
+    return _network(dc_nodes, nodes_fog, sensor_nodes, sensor_edge_lists)
+
+
+def generate_network_vectorized(n_sensors: int, n_fog: Optional[int] = None, seed: Optional[int] = None, batch_size: int = 4096) -> nx.Graph:
+    """Generates the same kind of topology as `generate_network` for large numbers of sensors.
+
+    Candidate sensor positions are sampled in NumPy batches and filtered with a prepared polygon, fog nodes in range
+    are found via an STRtree instead of testing every fog node for every sensor.
+
+    Args:
+        n_sensors: Number of sensors
+        n_fog: Maximum number of fog nodes
+        seed: Seed of the NumPy random generator. Derived from the `random` module if not set, so `random.seed()` still
+            makes the topology reproducible.
+        batch_size: Number of candidate positions sampled at once
+    """
+    mitte = _mitte()
+    shapely.prepare(mitte)
+    dc_nodes = _dc_nodes()
+    nodes_fog = _fog_nodes(n_fog)
+    fog_tree = shapely.STRtree([Point(*fog["pos"]) for fog in nodes_fog])
+    rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+
+    sensor_nodes, sensor_edge_lists = [], []
+    n_candidates = 0
+    while len(sensor_nodes) < n_sensors:
+        positions = rng.normal(SENSOR_CENTER, SENSOR_SIGMA, size=(batch_size, 2))
+        indices = np.flatnonzero(shapely.contains_xy(mitte, positions[:, 0], positions[:, 1]))
+        point_indices, fog_indices = fog_tree.query(shapely.points(positions[indices]), predicate="dwithin", distance=SENSOR_RADIUS)
+        for point_index, group in _group_by(point_indices, fog_indices):
+            if len(sensor_nodes) == n_sensors:
+                break
+            i = indices[point_index]
+            node = Sensor(name=str(n_candidates + i))
+            sensor_nodes.append({"id": node, "pos": tuple(positions[i])})
+            sensor_edge_lists.append([{"source": node, "target": nodes_fog[f]["id"], "link": Link4G()} for f in group])
+        n_candidates += batch_size
+    return _network(dc_nodes, nodes_fog, sensor_nodes, sensor_edge_lists)
+
+
+def _network(dc_nodes: List[Dict], nodes_fog: List[Dict], sensor_nodes, sensor_edge_lists) -> nx.Graph:
     nodes = dc_nodes + nodes_fog + list(sensor_nodes)
 
     edges = [edge for edge_list in sensor_edge_lists for edge in edge_list]  # flatten
@@ -40,6 +87,20 @@ def generate_network(n_sensors: int, n_fog: Optional[int] = None) -> nx.Graph:
     })
 
 
+def _mitte():
+    with open(MITTE_GEOJSON) as stream:
+        return shape(geojson.load(stream)["geometry"])
+
+
+def _group_by(keys: np.ndarray, values: np.ndarray):
+    """Yields (key, values) for sorted *keys*"""
+    if len(keys) == 0:
+        return
+    splits = np.flatnonzero(np.diff(keys)) + 1
+    for key_group, value_group in zip(np.split(keys, splits), np.split(values, splits)):
+        yield key_group[0], sorted(value_group)
+
+
 def _dc_nodes() -> List[Dict]:
     nodes = []
     with open(DC_GEOJSON) as stream:
@@ -64,12 +125,12 @@ def _fog_nodes(n: Optional[int] = None) -> List[Dict]:
     return nodes
 
 
-def _sensor_nodes(mitte, fog_nodes, sigma=0.03) -> List[Dict]:
+def _sensor_nodes(mitte, fog_nodes, sigma=SENSOR_SIGMA) -> List[Dict]:
     for i in count():
-        position = (random.gauss(13.39, sigma), random.gauss(52.522297, sigma))
+        position = (random.gauss(SENSOR_CENTER[0], sigma), random.gauss(SENSOR_CENTER[1], sigma))
         if not mitte.contains(Point(position)):
             continue
-        radius = Point(position).buffer(0.015)
+        radius = Point(position).buffer(SENSOR_RADIUS)
         edges = []
         node = Sensor(name=str(i))
         for fog in fog_nodes:
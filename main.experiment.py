@@ -1,19 +1,21 @@
 import logging
 import os
 import random
-from typing import Any
+import sys
+from typing import Any, Dict
 
 import networkx as nx
 import numpy as np
 
-from berlin_mitte.generate_network import generate_network
+from berlin_mitte.cache import load_network
 from berlin_mitte.plot import plot
 from pyfogsim.application import Application, Message, Sink, Source, Operator
 from pyfogsim.core import Simulation
-from pyfogsim.distribution import UniformDistribution, Distribution
-from pyfogsim.placement import CloudPlacement, EdgePlacement
+from pyfogsim.distribution import NumpyUniformDistribution, Distribution
+from pyfogsim.placement import CloudPlacement, EdgePlacement, OptimizedPlacement
 from pyfogsim.resource import Cloud, Fog, Sensor, Link4G, LinkCable
 from pyfogsim.selection import ShortestPath
+from pyfogsim.sweep import SweepConfig, sweep_grid, run_sweep
 
 logging.basicConfig(format="%(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 logging.getLogger("matplotlib").setLevel(logging.WARNING)
@@ -62,13 +64,13 @@ def generate_simple_network() -> nx.Graph:
     return G
 
 
-def setup_simulation(G):
-    simulation = Simulation(G, selection=ShortestPath())
+def setup_simulation(G, seed: int = 0):
+    simulation = Simulation(G, selection=ShortestPath(routing_table=True))
     # Application Graph
-    distribution = UniformDistribution(min=1, max=40)
+    distribution = NumpyUniformDistribution(min=1, max=40, seed=seed)
     cloud = next(n for n in G.nodes() if isinstance(n, Cloud))
     for sensor in [n for n in G.nodes() if isinstance(n, Sensor)]:
-        app = _app(f"App{sensor.name}", source_node=sensor, sink_node=cloud, distribution=distribution)
+        app = _app(f"App{sensor.name}", source_node=sensor, sink_node=cloud, distribution=distribution.spawn())
         simulation.deploy_app(app)
     return simulation
 
@@ -95,6 +97,14 @@ def main(network, simulated_time, placement, out_dir):
     # utils.draw_topology1(simulation.network, simulation.node_to_modules, name=placement.__name__)
 
 
+def run_config(config: SweepConfig) -> Dict:
+    random.seed(config.seed)
+    simulation = setup_simulation(load_network(config.n_sensors, seed=config.seed), seed=config.seed)
+    simulation.deploy_placement(config.placement(apps=simulation.apps))
+    simulation.run(until=config.simulated_time, progress_bar=False, fast=True)
+    return simulation.stats.summary()
+
+
 if __name__ == "__main__":
     random.seed(0)
 
@@ -103,16 +113,22 @@ if __name__ == "__main__":
     PLACEMENTS = [
         CloudPlacement,
         EdgePlacement,
-    #    GeneticPlacement,
+        OptimizedPlacement,
     ]
+
+    if "--sweep" in sys.argv:
+        configs = sweep_grid(n_sensors=[10, 100, 300], placements=PLACEMENTS, seeds=[0, 1, 2], simulated_times=[SIMULATED_TIME])
+        print(run_sweep(configs, run_config, out_dir="sweep"))
+        sys.exit()
+
     experiment_name = f"experiment_{N_SENSORS}_sensors"
     os.makedirs(experiment_name, exist_ok=True)
 
-    network = generate_network(N_SENSORS)
+    network = load_network(N_SENSORS, seed=0)
     plot(network, out_path=f"{experiment_name}/city.png", plot_map=True, plot_labels=True)
     plot(network, out_path=f"{experiment_name}/topology.png", plot_cloud_fog_edges=False)
 
     for placement in PLACEMENTS:
         out_dir = f"{experiment_name}/{placement.__name__}_{SIMULATED_TIME}"
         os.makedirs(out_dir, exist_ok=True)
-        main(network=generate_network(N_SENSORS), simulated_time=SIMULATED_TIME, placement=placement, out_dir=out_dir)
+        main(network=load_network(N_SENSORS, seed=0), simulated_time=SIMULATED_TIME, placement=placement, out_dir=out_dir)
@@ -0,0 +1,260 @@
+"""Analytic queueing-network estimate of a simulation's results, to screen many configurations before simulating them."""
+
+import logging
+from typing import Dict, Optional, List, Tuple
+
+import numpy as np
+import pandas as pd
+from networkx.utils import pairwise
+
+from pyfogsim.placement import Placement
+from pyfogsim.resource import FluidSharing, PriorityScheduler, ProcessorSharingScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class QueueingModel:
+    """Estimates utilizations and latencies of a simulation from queueing formulas instead of running it.
+
+    Every link and node is treated as an independent queue with Poisson arrivals (Jackson-network-style), the arrival rates
+    follow from the mean inter-arrival times of the sources, so the distributions of all sources must provide a `mean`:
+
+    - `StoreAndForward` links are M/G/1 queues whose service time is the link latency plus size / bandwidth
+      (Pollaczek-Khinchine), `FluidSharing` links are M/G/1 processor sharing queues on the serialization time.
+    - `FifoScheduler` nodes are M/G/1 queues, `PriorityScheduler` nodes non-preemptive M/G/1 priority queues and
+      `ProcessorSharingScheduler` nodes M/G/1 processor sharing queues. Nodes with several cores are approximated by a
+      single server which is *cores* times as fast.
+
+    Queues with a utilization of 1 or more are unstable, their waiting times are infinite. Batching is not modelled.
+
+    `summary()` and `print_report()` have the same shape as those of `Stats`. End-to-end percentiles assume the waiting
+    time of every application to be exponentially distributed, the maximum is not estimated.
+
+    Args:
+        simulation: Simulation whose network, applications and operator placement are evaluated. Paths are computed
+            by its selection.
+        total_time: Simulated time the expected message counts refer to
+        placement: If set, its allocation is run first to place the operators
+    """
+
+    TIMES = ["network_queue", "network_latency", "operator_queue", "operator_processing"]
+    PERCENTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, simulation: "Simulation", total_time: float, placement: Optional[Placement] = None):
+        if placement is not None:
+            placement._activate(simulation)  # Also updates the routing tables of the selection
+        self.total_time = total_time
+        self.apps = simulation.apps
+        self.nodes = list(simulation.network)
+        self.links = [link for _, _, link in simulation.network.edges(data="link")]
+
+        # Every arrival of a message at an operator or sink is a visit, every link it crossed on its way a hop
+        visits, hops = self._visits(simulation)
+        visit_app, visit_rate, visit_size, visit_node, visit_instructions, visit_priority = zip(*visits) if visits else [()] * 6
+        hop_visit, hop_link, hop_size = zip(*hops) if hops else [()] * 3
+        self.visit_app = np.array(visit_app, dtype=int)
+        self.visit_rate = np.array(visit_rate, dtype=float)
+        self.visit_size = np.array(visit_size, dtype=float)
+        self.visit_node = np.array(visit_node, dtype=int)
+        self._aggregate(
+            np.array(hop_visit, dtype=int), np.array(hop_link, dtype=int), np.array(hop_size, dtype=float),
+            np.array(visit_instructions, dtype=float), np.array(visit_priority, dtype=int),
+        )
+
+    def _visits(self, simulation: "Simulation") -> Tuple[List[Tuple], List[Tuple]]:
+        """Returns all visits as (app, rate, size, node or -1 for sinks, instructions, priority) and all hops as (visit, link, size)"""
+        node_index = {node: i for i, node in enumerate(self.nodes)}
+        link_index = {}
+        for i, (u, v) in enumerate(simulation.network.edges()):
+            link_index[u, v] = link_index[v, u] = i
+        visits, hops = [], []
+        for a, app in enumerate(self.apps):
+            rate = 1 / _mean_inter_arrival_time(app)
+            src_node, message = app.source.node, app.source.message_out
+            for module in app.operators + [app.sink]:
+                path = _path(simulation, app, message, src_node, module)
+                hops.extend((len(visits), link_index[x, y], message.size) for x, y in pairwise(path))
+                if module is app.sink:
+                    visits.append((a, rate, message.size, -1, 0, app.priority))
+                else:
+                    visits.append((a, rate, message.size, node_index[module.node], message.instructions, app.priority))
+                    src_node, message = module.node, module.message_out
+        return visits, hops
+
+    def _aggregate(self, hop_visit: np.ndarray, hop_link: np.ndarray, hop_size: np.ndarray, instructions: np.ndarray, priority: np.ndarray):
+        """Sums the arrival rates per link and node and computes the times of every visit"""
+        hop_queue, hop_latency, self.link_utilization = self._links(hop_link, self.visit_rate[hop_visit], hop_size)
+        n_visits = len(self.visit_app)
+        self.network_queue = np.bincount(hop_visit, weights=hop_queue, minlength=n_visits)
+        self.network_latency = np.bincount(hop_visit, weights=hop_latency, minlength=n_visits)
+
+        operators = self.visit_node >= 0
+        self.operator_queue = np.full(n_visits, np.nan)
+        self.operator_processing = np.full(n_visits, np.nan)
+        self.operator_queue[operators], self.operator_processing[operators], self.node_utilization = self._nodes(
+            self.visit_node[operators], self.visit_rate[operators], instructions[operators], priority[operators]
+        )
+
+    def _links(self, hop_link: np.ndarray, rate: np.ndarray, size: np.ndarray):
+        """Returns the queue time and latency of every hop and the utilization of every link"""
+        n = len(self.links)
+        latency = np.array([link.latency for link in self.links], dtype=float)[hop_link]
+        serialization = size / np.array([link.bandwidth for link in self.links], dtype=float)[hop_link]
+        fluid = np.array([isinstance(link.model, FluidSharing) for link in self.links], dtype=bool)[hop_link]
+        service = np.where(fluid, serialization, latency + serialization)  # Time a message occupies the link
+        utilization = np.bincount(hop_link, weights=rate * service, minlength=n)
+        second_moment = np.bincount(hop_link, weights=rate * service ** 2, minlength=n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stable = utilization < 1
+            waiting = np.where(stable, second_moment / (2 * (1 - utilization)), np.inf)
+            stretch = np.where(stable, utilization / (1 - utilization), np.inf)
+            queue = np.where(fluid, serialization * stretch[hop_link], waiting[hop_link])
+        return queue, latency + serialization, utilization
+
+    def _nodes(self, visit_node: np.ndarray, rate: np.ndarray, instructions: np.ndarray, priority: np.ndarray):
+        """Returns the queue and processing time of every operator visit and the utilization of every node"""
+        n = len(self.nodes)
+        ipt = np.array([node.ipt for node in self.nodes], dtype=float)
+        cores = np.array([node.cores for node in self.nodes], dtype=float)
+        processing = instructions / ipt[visit_node]
+        service = processing / cores[visit_node]
+        utilization = np.bincount(visit_node, weights=rate * service, minlength=n)
+        residual = np.bincount(visit_node, weights=rate * service ** 2, minlength=n) / 2  # Mean residual work seen on arrival
+
+        # Non-preemptive priority queues: Waiting times depend on the utilization by classes of higher or equal priority
+        classes, priority_class = np.unique(priority, return_inverse=True)
+        class_utilization = np.zeros((n, len(classes)))
+        np.add.at(class_utilization, (visit_node, priority_class), rate * service)
+        higher_or_equal = np.cumsum(class_utilization, axis=1)[visit_node, priority_class]
+        higher = higher_or_equal - class_utilization[visit_node, priority_class]
+
+        scheduler = np.array([
+            2 if issubclass(node.scheduler, ProcessorSharingScheduler) else 1 if issubclass(node.scheduler, PriorityScheduler) else 0
+            for node in self.nodes
+        ])[visit_node]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stable = utilization[visit_node] < 1
+            fifo = residual[visit_node] / (1 - utilization[visit_node])
+            prioritized = residual[visit_node] / ((1 - higher) * (1 - higher_or_equal))
+            shared = processing * utilization[visit_node] / (1 - utilization[visit_node])
+            queue = np.choose(scheduler, [fifo, prioritized, shared])
+            queue = np.where(stable | ((scheduler == 1) & (higher_or_equal < 1)), queue, np.inf)
+        return queue, processing, utilization
+
+    def _app_latencies(self):
+        """Returns the deterministic part and the mean waiting time of every application's end-to-end latency"""
+        n = len(self.apps)
+        fixed = self.network_latency + np.nan_to_num(self.operator_processing)
+        waiting = self.network_queue + np.nan_to_num(self.operator_queue, posinf=np.inf)
+        return np.bincount(self.visit_app, weights=fixed, minlength=n), np.bincount(self.visit_app, weights=waiting, minlength=n)
+
+    def app_latencies(self) -> pd.DataFrame:
+        """Expected end-to-end latency, its waiting share and the message rate per application"""
+        fixed, waiting = self._app_latencies()
+        rates = np.array([1 / _mean_inter_arrival_time(app) for app in self.apps])
+        return pd.DataFrame(
+            {"rate": rates, "end_to_end_latency": fixed + waiting, "waiting": waiting},
+            index=pd.Index([app.name for app in self.apps], name="app_name"),
+        )
+
+    def node_usage(self) -> pd.Series:
+        """Expected fraction of busy cores per node"""
+        return pd.Series(self.node_utilization, index=self.nodes, name="usage")
+
+    def link_usage(self) -> pd.Series:
+        """Expected fraction of time every link is busy"""
+        return pd.Series(self.link_utilization, index=self.links, name="usage")
+
+    def count_messages(self) -> float:
+        return self.total_time * self.visit_rate.sum()
+
+    def bytes_transmitted(self) -> float:
+        return self.total_time * (self.visit_rate * self.visit_size).sum()
+
+    def means(self) -> Dict[str, float]:
+        """Mean times over all logged messages, weighted by their rates, operator times only over messages to operators"""
+        result = {}
+        for name in self.TIMES:
+            values = getattr(self, name)
+            mask = ~np.isnan(values)
+            weights = self.visit_rate[mask]
+            result[name] = float((weights * values[mask]).sum() / weights.sum()) if weights.sum() > 0 else np.nan
+        return result
+
+    def end_to_end_percentiles(self, percentiles=PERCENTILES) -> List[float]:
+        """Percentiles of the end-to-end latency over all messages arriving at sinks"""
+        fixed, waiting = self._app_latencies()
+        rates = np.array([1 / _mean_inter_arrival_time(app) for app in self.apps])
+        return list(_mixture_quantiles(rates / rates.sum(), fixed, waiting, np.asarray(percentiles, dtype=float)))
+
+    def summary(self) -> Dict[str, float]:
+        """Returns the same key figures as `Stats.summary`"""
+        result = {"messages": self.count_messages(), "bytes": self.bytes_transmitted()}
+        means = self.means()
+        result["message_time"] = sum(means.values())
+        result.update(means)
+        for q, value in zip(self.PERCENTILES, self.end_to_end_percentiles()):
+            result[f"end_to_end_p{q * 100:g}"] = value
+        result["end_to_end_max"] = np.nan
+        return result
+
+    def print_report(self, total_time: Optional[float] = None):
+        print("\n------------ ESTIMATE -----------")
+        print(f"Simulation Time:      {total_time if total_time is not None else self.total_time}")
+        print(f"Messages transmitted: {self.count_messages():.0f}")
+        print(f"Bytes transmitted:    {self.bytes_transmitted():.0f}")
+        print()
+
+        if len(self.visit_app) == 0:
+            return
+        means = self.means()
+        print(f"Average message time:  {sum(means.values()):.3f}")
+        print(f"- network queue:       {means['network_queue']:.3f}")
+        print(f"- network latency:     {means['network_latency']:.3f}")
+        print(f"- operator queue:      {means['operator_queue']:.3f}")
+        print(f"- operator processing: {means['operator_processing']:.3f}")
+
+        p50, p95, p99 = self.end_to_end_percentiles()
+        print()
+        print(f"End-to-end latency:    p50 {p50:.3f}  p95 {p95:.3f}  p99 {p99:.3f}")
+
+
+def _mean_inter_arrival_time(app) -> float:
+    try:
+        return app.source.distribution.mean
+    except AttributeError:
+        raise ValueError(f"The distribution of source '{app.source.name}' has no mean.")
+
+
+def _path(simulation: "Simulation", app, message, src_node, module) -> List:
+    """Path of a message from *src_node* to the node of *module*, a single node if they are co-located"""
+    if module.node is None:
+        raise ValueError(f"Module '{module.name}' is not placed, pass a placement.")
+    if src_node == module.node:
+        return [src_node]
+    return simulation.selection.get_path(simulation.network, message.create(0, app), src_node, module.node)
+
+
+def _mixture_quantiles(weights: np.ndarray, fixed: np.ndarray, waiting: np.ndarray, q: np.ndarray, iterations: int = 64) -> np.ndarray:
+    """Quantiles of a mixture of shifted exponential distributions (shift *fixed*, mean *waiting*) via bisection"""
+    if len(weights) == 0:
+        return np.full(len(q), np.nan)
+    finite = np.isfinite(waiting)
+    stable_share = weights[finite].sum()
+    if not finite.any():
+        return np.full(len(q), np.inf)
+    weights, fixed, waiting = weights[finite], fixed[finite, None], waiting[finite, None]
+
+    def cdf(t: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            exponential = np.where(waiting > 0, 1 - np.exp(-(t - fixed) / waiting), 1)
+        return weights @ np.where(t >= fixed, exponential, 0)
+
+    low = np.zeros(len(q))
+    high = np.full(len(q), float((fixed + waiting * 50).max()) + 1)
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        below = cdf(mid) < q
+        low = np.where(below, mid, low)
+        high = np.where(below, high, mid)
+    return np.where(q < stable_share, high, np.inf)
@@ -1,9 +1,9 @@
 from abc import ABC
-from copy import copy
 from typing import List, Optional, Dict, Any
 
 import logging
 from pyfogsim.distribution import Distribution
+from pyfogsim.resource import Job
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +11,8 @@ logger = logging.getLogger(__name__)
 class Message:
     """Representation of a request between two modules.
 
+    A `Message` is a template: Every message that is actually sent during the simulation is a `MessageInstance` created via `create()`.
+
     Args:
         name: Message name
         dst: Name of the module who receives this message
@@ -18,29 +20,151 @@ class Message:
         size: Size in bytes
     """
 
+    __slots__ = ("name", "dst", "instructions", "size")
+
     def __init__(self, name: str, dst: "Module", instructions: int = 0, size: int = 0):
         self.name = name
         self.dst = dst
         self.instructions = instructions
         self.size = size
 
-        self.created = None  # Simulation timestamp when the message was created and queued for sending
+    def __str__(self):
+        return f"Message(\"{self.name}\")"
+
+    def create(self, created: float, application: "Application", count: int = 1) -> "MessageInstance":
+        """Creates a new message from this template, aggregating *count* logical messages"""
+        return MessageInstance(self, created, application, count)
+
+    def evolve(self, **kwargs) -> "MessageInstance":
+        """Creates a new message from this template and sets the given attributes. Prefer `create()` on the hot path."""
+        message = MessageInstance(self, kwargs.pop("created", None), kwargs.pop("application", None))
+        for key, value in kwargs.items():
+            setattr(message, key, value)
+        return message
+
+
+class MessageInstance:
+    """A message in flight, created from a `Message` template.
+
+    Args:
+        template: Message template this message was created from
+        created: Simulation timestamp when the message was created and queued for sending
+        application: Application which sent the message
+        count: Number of logical messages aggregated in this message, size and instructions are scaled accordingly
+    """
+
+    __slots__ = (
+        "name",
+        "dst",
+        "instructions",
+        "size",
+        "created",
+        "network_queue",
+        "network_latency",
+        "operator_queue",
+        "operator_processing",
+        "application",
+        "count",
+        "batch_wait",
+        "origin",
+    )
+
+    def __init__(self, template: Message, created: Optional[float], application: Optional["Application"], count: int = 1):
+        self.name = template.name
+        self.dst = template.dst
+        self.instructions = template.instructions * count
+        self.size = template.size * count
+        self.count = count
+
+        self.created = created
+        self.batch_wait = 0  # Average time the logical messages waited for their batch to be sent
+        self.origin = created  # Average time the requests this message belongs to were created at their source
 
         self.network_queue = None
         self.network_latency = None
         self.operator_queue = None
         self.operator_processing = None
 
-        self.application = None  # TODO Remove this, Message should have no knowledge about application
+        self.application = application  # TODO Remove this, Message should have no knowledge about application
 
     def __str__(self):
         return f"Message(\"{self.name}\")"
 
-    def evolve(self, **kwargs) -> "Message":
-        message = copy(self)
-        for key, value in kwargs.items():
-            setattr(message, key, value)
-        return message
+
+class Batching:
+    """Policy to aggregate logical messages into a single message before sending it.
+
+    A batch is sent as soon as it contains at least *max_size* logical messages or *window* time units passed since its first
+    message, whichever comes first. At least one of both must be set.
+
+    Args:
+        max_size: Maximum number of logical messages per batch
+        window: Maximum time the first message of a batch waits
+    """
+
+    def __init__(self, max_size: Optional[int] = None, window: Optional[float] = None):
+        if max_size is None and window is None:
+            raise ValueError("Batching requires a max_size or a window.")
+        self.max_size = max_size
+        self.window = window
+
+
+class _Batcher:
+    """Collects the outgoing messages of a module according to a `Batching` policy"""
+
+    def __init__(self, policy: Batching, module: "Module", template: Message):
+        self.policy = policy
+        self.module = module
+        self.template = template
+        self.count = 0
+        self.created_sum = 0  # Sum of the creation times of all logical messages, to compute their average waiting time
+        self.origin_sum = 0
+        self.application = None
+        self.deadline = None  # Time the window of the current batch ends
+        self._generation = 0  # Incremented on every flush, invalidates the window timer of previous batches
+
+    def add(self, count: int, created: float, origin: float, application: "Application", simulation: "Simulation"):
+        if self.count == 0 and self.policy.window is not None:
+            self.deadline = simulation.env.now + self.policy.window
+            simulation.env.process(self._window_timer(self._generation, simulation))
+        self.count += count
+        self.created_sum += count * created
+        self.origin_sum += count * origin
+        self.application = application
+        if self.policy.max_size is not None and self.count >= self.policy.max_size:
+            self.flush(simulation)
+
+    def flush(self, simulation: "Simulation"):
+        if self.count == 0:
+            return
+        now = simulation.env.now
+        message = self.template.create(now, self.application, self.count)
+        message.batch_wait = now - self.created_sum / self.count
+        message.origin = self.origin_sum / self.count
+        self.count = 0
+        self.created_sum = 0
+        self.origin_sum = 0
+        self.deadline = None
+        self._generation += 1
+        simulation.send(message, self.module.node)
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"count": self.count, "created_sum": self.created_sum, "origin_sum": self.origin_sum, "deadline": self.deadline}
+
+    def set_state(self, state: Dict[str, Any], application: "Application", simulation: "Simulation") -> None:
+        """Restores a pending batch and restarts its window timer"""
+        self.count = state["count"]
+        self.created_sum = state["created_sum"]
+        self.origin_sum = state["origin_sum"]
+        self.application = application if self.count else None
+        self.deadline = state["deadline"]
+        if self.deadline is not None:
+            simulation.env.process(self._window_timer(self._generation, simulation, self.deadline - simulation.env.now))
+
+    def _window_timer(self, generation: int, simulation: "Simulation", delay: Optional[float] = None):
+        yield simulation.env.timeout(self.policy.window if delay is None else delay)
+        if generation == self._generation:
+            self.flush(simulation)
 
 
 class Module(ABC):
@@ -54,18 +178,50 @@ class Module(ABC):
 
 
 class Source(Module):
-    def __init__(self, name: str, node: Any, message_out: "Message", distribution: Distribution, data: Optional[Dict] = None):
+    """Generates messages according to a distribution.
+
+    Args:
+        batching: If set, readings are aggregated into batches before they are sent
+    """
+
+    def __init__(
+        self,
+        name: str,
+        node: Any,
+        message_out: "Message",
+        distribution: Distribution,
+        data: Optional[Dict] = None,
+        batching: Optional[Batching] = None,
+    ):
         super().__init__(name, data)
         self.node = node
         self.message_out = message_out
         self.distribution = distribution
+        self.batcher = _Batcher(batching, self, message_out) if batching else None
+        self.next_emission = None  # Time of the next reading
 
-    def run(self, simulation: "Simulation", app: "Application"):
+    def run(self, simulation: "Simulation", app: "Application", next_emission: Optional[float] = None):
+        """Emits readings until the simulation ends.
+
+        Args:
+            next_emission: Only when resuming from a checkpoint: Time of the first reading
+        """
         logger.debug("Added_Process - Source")
+        if next_emission is not None:
+            self.next_emission = next_emission
+            yield simulation.env.timeout(next_emission - simulation.env.now)
+            self._emit(simulation, app)
         while True:
-            yield simulation.env.timeout(next(self.distribution))
-            message = self.message_out.evolve(created=simulation.env.now, application=app)
-            simulation.env.process(simulation.transmission_process(message, self.node))
+            delay = next(self.distribution)
+            self.next_emission = simulation.env.now + delay
+            yield simulation.env.timeout(delay)
+            self._emit(simulation, app)
+
+    def _emit(self, simulation: "Simulation", app: "Application"):
+        if self.batcher is not None:
+            self.batcher.add(1, simulation.env.now, simulation.env.now, app, simulation)
+        else:
+            simulation.send(self.message_out.create(simulation.env.now, app), self.node)
 
 
 class Operator(Module):
@@ -73,28 +229,39 @@ class Operator(Module):
 
     Args:
         message_out: Output message. If Empty the module is a sink
+        batching: If set, output messages are aggregated into batches before they are sent
+        ram: Memory in MB required on the node the operator is placed on
     """
 
-    def __init__(self, name: str, message_out: "Message", data: Optional[Dict] = None):
+    def __init__(self, name: str, message_out: "Message", data: Optional[Dict] = None, batching: Optional[Batching] = None, ram: int = 0):
         super().__init__(name, data)
         self.message_out = message_out
-
-    def enter(self, message: "Message", simulation: "Simulation"):
-        logger.debug(f"{message} arrived in operator {self.name}.")
-        service_time = message.instructions / self.node.ipt
-
-        with self.node.request() as req:
-            queue_start = simulation.env.now
-            yield req
-            process_start = simulation.env.now
-            yield simulation.env.timeout(service_time)
-        message.operator_queue = process_start - queue_start
-        message.operator_processing = simulation.env.now - process_start
+        self.ram = ram
+        self.batcher = _Batcher(batching, self, message_out) if batching else None
+
+    def enter(self, message: "MessageInstance", simulation: "Simulation", job: Optional[Job] = None):
+        """Processes the message on the operator's node and sends the result.
+
+        Args:
+            job: Only when resuming from a checkpoint: The message's job on the node
+        """
+        if job is not None:
+            queue_time, processing_time = yield from self.node.resume(job)
+        else:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"{message} arrived in operator {self.name}.")
+            queue_time, processing_time = yield from self.node.process(message.instructions, message.application.priority, message)
+        message.operator_queue = queue_time
+        message.operator_processing = processing_time
 
         simulation.event_log.append(app=message.application, module=self, message=message)
 
-        message_out = self.message_out.evolve(created=simulation.env.now, application=message.application)
-        simulation.env.process(simulation.transmission_process(message_out, self.node))
+        if self.batcher is not None:
+            self.batcher.add(message.count, simulation.env.now, message.origin, message.application, simulation)
+        else:
+            message_out = self.message_out.create(simulation.env.now, message.application, message.count)
+            message_out.origin = message.origin
+            simulation.send(message_out, self.node)
 
 
 class Sink(Module):
@@ -103,8 +270,9 @@ class Sink(Module):
         super().__init__(name, data)
         self.node = node
 
-    def enter(self, message: "Message", simulation):
-        logger.debug(f"{message} arrived in sink {self.name}")
+    def enter(self, message: "MessageInstance", simulation):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{message} arrived in sink {self.name}")
         simulation.event_log.append(app=message.application, module=self, message=message)
         return
         yield
@@ -115,10 +283,12 @@ class Application:
 
     Args:
         name: Application name, unique within the same topology.
+        priority: Priority of the application's operators on nodes with a `PriorityScheduler`, lower values are served first
     """
 
-    def __init__(self, name: str, source: Source, operators: List[Operator], sink: Sink):
+    def __init__(self, name: str, source: Source, operators: List[Operator], sink: Sink, priority: int = 0):
         self.name = name
+        self.priority = priority
         self.source = source
         self.operators = operators
         self.sink = sink
@@ -1,48 +1,235 @@
 """This module unifies the event-discrete simulation environment with the rest of modules: placement, topology, selection, population, utils and metrics."""
 
 import logging
+import os
+import pickle
+import random
 import time
-from typing import Optional, List, Dict, Any
+from collections import Counter, defaultdict
+from functools import wraps
+from typing import Optional, List, Dict, Any, Callable, Type, Tuple
 
+import numpy as np
 import simpy
-from networkx.utils import pairwise, nx
-from simpy import Process, Resource
+from networkx.utils import nx
+from simpy import Process
 from tqdm import tqdm
 
-from pyfogsim.application import Application, Message, Module
+from pyfogsim.application import Application, MessageInstance, Module, Operator
 from pyfogsim.placement import Placement
+from pyfogsim.resource import QueueTrace, LinkModel, StoreAndForward, Job, Link
 from pyfogsim.selection import Selection
 from pyfogsim.stats import Stats, EventLog
 
 
+CHECKPOINT_VERSION = 1
+
+
 class SimulationTimeFilter(logging.Filter):
+    """Adds the time of the most recently created simulation to log records"""
 
-    def __init__(self, env):
+    def __init__(self, env=None):
         super().__init__()
         self.env = env
 
     def filter(self, record):
-        record.simulation_time = self.env.now
+        record.simulation_time = self.env.now if self.env is not None else float("nan")
         return True
 
 
+# Handler and filter are attached once per process, every new simulation only updates the environment of the filter.
+# Debug messages on the message hot path are guarded by `logger.isEnabledFor(logging.DEBUG)`, so they are not even
+# formatted unless debug logging is enabled.
 logger = logging.getLogger(__name__)
 logger.propagate = False
+time_filter = SimulationTimeFilter()
+logger.addFilter(time_filter)
 ch = logging.StreamHandler()
 ch.setFormatter(logging.Formatter('%(simulation_time).4f - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(ch)
+
+
+class Instrumentation:
+    """Opt-in instrumentation of a simulation's hot paths.
+
+    Counts processed simpy events, transmissions and operator executions and measures the wall time spent in
+    `Selection.get_path`, `Placement._run` and `EventLog.append`. The methods are wrapped on attaching, so a simulation
+    without instrumentation does not pay for it.
+
+    Args:
+        interval: If set, a snapshot of all counters is appended to `time_series` every *interval* simulated time units
+    """
+
+    SECTIONS = ("selection.get_path", "placement._run", "event_log.append")
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval
+        self.events = 0
+        self.transmissions = 0
+        self.operator_executions = 0
+        self.max_queue_size = 0
+        self.calls = Counter()
+        self.seconds = defaultdict(float)
+        self.wall_time = 0
+        self.time_series = []
+        self.env = None
+        self._run_start = None
+
+    def attach(self, simulation: "Simulation") -> None:
+        self.set_env(simulation.env)
+        send = simulation.send
+
+        def counting_send(message, src_node):
+            self.transmissions += 1
+            send(message, src_node)
+
+        simulation.send = counting_send
+        simulation.selection.get_path = self._timed("selection.get_path", simulation.selection.get_path)
+        append = self._timed("event_log.append", simulation.event_log.append)
+
+        def counting_append(app, module, message):
+            if isinstance(module, Operator):
+                self.operator_executions += 1
+            append(app, module, message)
+
+        simulation.event_log.append = counting_append
+
+    def set_env(self, env: simpy.Environment) -> None:
+        """Counts the events processed by *env*, invoked again when a simulation is restored from a checkpoint"""
+        self.env = env
+        step = env.step
+
+        def counting_step():
+            self.events += 1
+            step()
+
+        env.step = counting_step
+        if self.interval is not None:
+            env.process(self._sample_process())
+
+    def attach_placement(self, placement: Placement) -> None:
+        placement._run = self._timed("placement._run", placement._run)
+
+    def start(self) -> None:
+        self._run_start = time.perf_counter()
+
+    def stop(self) -> None:
+        self.wall_time += time.perf_counter() - self._run_start
+        self._run_start = None
+
+    @property
+    def queue_size(self) -> int:
+        """Number of events currently scheduled in simpy"""
+        return len(self.env._queue)
+
+    def report(self) -> Dict[str, Any]:
+        """Returns all counters and timings as a (nested) dictionary"""
+        wall_time = self._current_wall_time()
+        return {
+            "simulated_time": self.env.now,
+            "wall_time": wall_time,
+            "events": self.events,
+            "events_per_second": _rate(self.events, wall_time),
+            "transmissions": self.transmissions,
+            "transmissions_per_second": _rate(self.transmissions, wall_time),
+            "operator_executions": self.operator_executions,
+            "operator_executions_per_second": _rate(self.operator_executions, wall_time),
+            "queue_size": self.queue_size,
+            "max_queue_size": max(self.max_queue_size, self.queue_size),
+            "sections": {name: {"calls": self.calls[name], "seconds": self.seconds[name]} for name in self.SECTIONS},
+        }
+
+    def _timed(self, name: str, method: Callable) -> Callable:
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+                self.calls[name] += 1
+
+        return timed
+
+    def _current_wall_time(self) -> float:
+        if self._run_start is None:
+            return self.wall_time
+        return self.wall_time + time.perf_counter() - self._run_start
+
+    def _sample_process(self):
+        while True:
+            yield self.env.timeout(self.interval)
+            self.max_queue_size = max(self.max_queue_size, self.queue_size)
+            self.time_series.append({
+                "simulated_time": self.env.now,
+                "wall_time": self._current_wall_time(),
+                "events": self.events,
+                "transmissions": self.transmissions,
+                "operator_executions": self.operator_executions,
+                "queue_size": self.queue_size,
+                **{f"{name}.seconds": self.seconds[name] for name in self.SECTIONS},
+            })
+
+
+def _rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else 0.0
+
+
+class Transmission:
+    """A message on its way along a path. The explicit state of a transmission process, to checkpoint simulations.
+
+    Args:
+        message: Transmitted message
+        path: Nodes from the sending to the receiving node
+        hop: Index of the link in *path* the message is currently transmitted over
+    """
+
+    __slots__ = ("message", "path", "hop")
+
+    def __init__(self, message: MessageInstance, path: List[Any], hop: int = 0):
+        self.message = message
+        self.path = path
+        self.hop = hop
 
 
 class Simulation:
-    """Contains the cloud event-discrete simulation environment and controls the structure variables."""
+    """Contains the cloud event-discrete simulation environment and controls the structure variables.
 
-    def __init__(self, network: nx.Graph, selection: Selection):
+    Args:
+        network: Network topology of `Node` objects connected via edges with a "link" attribute
+        selection: Selection algorithm which computes the message paths
+        event_log: Event log which records all delivered messages. Defaults to a list-based `EventLog`, use a `ColumnarEventLog`
+            for large simulations.
+        queue_trace: Factory for the `QueueTrace` of every node and link, e.g. `functools.partial(QueueTrace, interval=10)`.
+            By default, queue lengths are not recorded.
+        link_model: Defines how messages share the capacity of links, `StoreAndForward` queues messages on every link while
+            `FluidSharing` lets concurrent messages share the bandwidth.
+        instrumentation: If set, collects event rates and timings of the simulation's hot paths
+    """
+
+    def __init__(
+        self,
+        network: nx.Graph,
+        selection: Selection,
+        event_log: Optional[EventLog] = None,
+        queue_trace: Optional[Callable[[], QueueTrace]] = None,
+        link_model: Type[LinkModel] = StoreAndForward,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
         self.env = simpy.Environment()
-        logger.addFilter(SimulationTimeFilter(self.env))
-        logger.addHandler(ch)
-        self.network = self._prepare_network(network)
+        time_filter.env = self.env
+        self.queue_trace = queue_trace
+        self.link_model = link_model
+        self.network = self._prepare_network(network, queue_trace, link_model)
         self.selection = selection
-        self.event_log = EventLog()
+        self.selection.set_env(self.env)
+        self.event_log = event_log if event_log is not None else EventLog()
         self.apps = []
+        self.placements = []
+        self.path_lengths = Counter()  # Number of sent messages per path length in hops, 0 means the modules are co-located
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.attach(self)
 
     @property
     def stats(self):
@@ -59,45 +246,342 @@ class Simulation:
                 result[operator.node].append(operator)
         return result
 
-    def run(self, until: int, results_path: Optional[str] = None, progress_bar: bool = True):
-        """Runs the simulation"""
+    def run(
+        self,
+        until: int,
+        results_path: Optional[str] = None,
+        progress_bar: bool = True,
+        fast: bool = False,
+        chunk_size: Optional[float] = None,
+        progress_interval: Optional[float] = None,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_interval: Optional[float] = None,
+    ):
+        """Runs the simulation
+
+        Args:
+            until: Simulation time to run until. A simulation restored from a checkpoint continues from the checkpoint's time.
+            results_path: If set, the event log is written to this directory after the run
+            progress_bar: Display a progress bar
+            fast: If True, simpy runs the whole horizon (or coarse chunks of it) at once instead of being invoked once per time unit.
+                Progress is then reported by a periodic process every *progress_interval* time units.
+            chunk_size: Only in fast mode: Number of time units simulated per call to simpy. Defaults to the whole horizon.
+            progress_interval: Only in fast mode: Simulated time between two progress reports. Defaults to 1% of the horizon.
+            progress_callback: Only in fast mode: Invoked with the current simulation time on every progress report.
+            checkpoint_path: If set, the state of the simulation is written to this file every *checkpoint_interval* time
+                units, see `restore()`. In fast mode, checkpoints are written at chunk boundaries.
+            checkpoint_interval: Simulated time between two checkpoints, defaults to 10% of the horizon. In fast mode, it is
+                also the default *chunk_size*.
+        """
         start_time = time.time()
-        for i in tqdm(range(1, until), total=until, disable=(not progress_bar)):
-            self.env.run(until=i)
+        if self.instrumentation is not None:
+            self.instrumentation.start()
+        chunk_callback = None
+        if checkpoint_path is not None:
+            checkpoint_interval = checkpoint_interval or max(until / 10, 1)
+            chunk_size = chunk_size or checkpoint_interval
+            chunk_callback = self._checkpointer(checkpoint_path, checkpoint_interval, until)
+        if fast:
+            self._run_fast(until, progress_bar, chunk_size, progress_interval, progress_callback, chunk_callback)
+        else:
+            self._run_stepped(until, progress_bar, chunk_callback)
+        if self.instrumentation is not None:
+            self.instrumentation.stop()
+        self.event_log.flush()
         if results_path:
             self.event_log.write(results_path)
         logger.info(f"Simulated {until} time units in {time.time() - start_time} seconds.")
 
+    def _run_stepped(self, until, progress_bar, chunk_callback=None):
+        start = int(self.env.now) + 1
+        for i in tqdm(range(start, until + 1), total=until, initial=start - 1, disable=(not progress_bar)):
+            self.env.run(until=i)
+            if chunk_callback is not None:
+                chunk_callback(i)
+
+    def _run_fast(self, until, progress_bar, chunk_size, progress_interval, progress_callback, chunk_callback=None):
+        callbacks = [] if progress_callback is None else [progress_callback]
+        with tqdm(total=until, disable=(not progress_bar)) as pbar:
+            if progress_bar:
+                callbacks.append(lambda now: pbar.update(now - pbar.n))
+            if callbacks:
+                self.env.process(self._progress_process(until, progress_interval or max(until / 100, 1), callbacks))
+            if chunk_size is None:
+                self.env.run(until=until)
+            else:
+                t = self.env.now
+                while t < until:
+                    t = min(t + chunk_size, until)
+                    self.env.run(until=t)
+                    if chunk_callback is not None:
+                        chunk_callback(t)
+            for callback in callbacks:
+                callback(self.env.now)
+
+    def _checkpointer(self, path: str, interval: float, until: float) -> Callable[[float], None]:
+        """Returns a callback for the end of every chunk which writes a checkpoint every *interval* time units"""
+        next_checkpoint = self.env.now + interval
+
+        def after_chunk(now: float) -> None:
+            nonlocal next_checkpoint
+            if next_checkpoint <= now < until:
+                self.checkpoint(path)
+                next_checkpoint = now + interval
+
+        return after_chunk
+
+    def _progress_process(self, until: float, interval: float, callbacks: List[Callable[[float], None]]):
+        while self.env.now + interval < until:
+            yield self.env.timeout(interval)
+            for callback in callbacks:
+                callback(self.env.now)
+
     def deploy_app(self, app: Application):
         """This process is responsible for linking the *application* to the different algorithms (placement, population, and service)"""
         self.apps.append(app)
         self.env.process(app.source.run(self, app))
 
     def deploy_placement(self, placement: Placement) -> Process:
+        if self.instrumentation is not None:
+            self.instrumentation.attach_placement(placement)
+        self.placements.append(placement)
         return self.env.process(placement.run(self))
 
-    def transmission_process(self, message: Message, src_node):
-        queue_times = []
-        latencies = []
-        path = self.selection.get_path(self.network, message, src_node, message.dst.node)
-        logger.debug(f"Sending {message} via path {path}.")
-        for x, y in pairwise(path):
-            link = self.network.edges[x, y]["link"]
-            latency = link.latency + message.size / link.bandwidth
-            with link.request() as req:
-                queue_start = self.env.now
-                yield req
-                queue_times.append(self.env.now - queue_start)
-                yield self.env.timeout(latency)
-                latencies.append(latency)
-        message.network_queue = sum(queue_times)
-        message.network_latency = sum(latencies)
-        logger.debug(f"Sent    {message}. Total Latency: {message.network_latency + message.network_queue} ({message.network_queue} due to congestion).")
+    def add_link(self, u: Any, v: Any, link: Link) -> None:
+        """Connects two nodes while the simulation is running, nodes which are not part of the network yet are added.
+
+        Topology changes have to go through the simulation, so the selection can update its routing tables.
+        """
+        for node in (u, v):
+            if node not in self.network:
+                node.set_env(self.env, self.queue_trace)
+        self.network.add_edge(u, v, link=link)
+        link.set_env(self.env, self.queue_trace, self.link_model)
+        self.selection.update(self.network, self.apps)
+
+    def remove_link(self, u: Any, v: Any) -> None:
+        """Disconnects two nodes while the simulation is running. Messages which are sent over the link must have arrived."""
+        self.network.remove_edge(u, v)
+        self.selection.update(self.network, self.apps)
+
+    def remove_node(self, node: Any) -> None:
+        """Removes a node and its links while the simulation is running. No modules may be placed on it anymore."""
+        self.network.remove_node(node)
+        self.selection.update(self.network, self.apps)
+
+    def send(self, message: MessageInstance, src_node: Any):
+        """Sends the message from *src_node* to the node of its destination module.
+
+        Messages between modules on the same node are delivered right away, without a path lookup or a transmission process.
+        If the selection allows it, messages between neighbouring nodes are sent over their direct link without a path lookup.
+        """
+        dst_node = message.dst.node
+        if src_node == dst_node:
+            self.path_lengths[0] += 1
+            message.network_queue = 0
+            message.network_latency = 0
+            self.env.process(message.dst.enter(message, self))
+            return
+        if self.selection.direct_neighbours and self.network.has_edge(src_node, dst_node):
+            path = [src_node, dst_node]
+        else:
+            path = self.selection.get_path(self.network, message, src_node, dst_node)
+        self.path_lengths[len(path) - 1] += 1
+        self.env.process(self.transmission_process(message, src_node, path))
+
+    def transmission_process(self, message: MessageInstance, src_node: Any, path: Optional[List[Any]] = None):
+        if path is None:
+            path = self.selection.get_path(self.network, message, src_node, message.dst.node)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Sending {message} via path {path}.")
+        message.network_queue = 0
+        message.network_latency = 0
+        yield from self._transmit(Transmission(message, path))
+
+    def _transmit(self, transmission: Transmission, job: Optional[Job] = None):
+        """Transmits the message hop by hop, starting at the transmission's current hop (with *job* if it is resumed)"""
+        message, path = transmission.message, transmission.path
+        for hop in range(transmission.hop, len(path) - 1):
+            transmission.hop = hop
+            link = self.network.edges[path[hop], path[hop + 1]]["link"]
+            if job is None:
+                queue_time, latency = yield from link.transmit(message.size, transmission)
+            else:
+                queue_time, latency = yield from link.resume(job)
+                job = None
+            message.network_queue += queue_time
+            message.network_latency += latency
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Sent    {message}. Total Latency: {message.network_latency + message.network_queue} ({message.network_queue} due to congestion).")
         self.env.process(message.dst.enter(message, self))
 
-    def _prepare_network(self, network: nx.Graph) -> nx.Graph:
+    def checkpoint(self, path: str) -> None:
+        """Writes the state of the simulation to *path*, so it can be resumed by `restore()` in another process.
+
+        The checkpoint contains the state of all sources, batches, placements, links and nodes (including the messages
+        which are transmitted or processed), the random number generators and the event log. A `StreamingEventLog` is
+        flushed and only its offset on disk is stored, other event logs are stored completely.
+        """
+        nodes = {node: i for i, node in enumerate(self.network)}
+        encode_message = self._message_encoder()
+        placements = []
+        for placement in self.placements:
+            activation_dist = placement.activation_dist
+            try:
+                pickle.dumps(activation_dist)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                logger.warning(f"Activation distribution of {placement.__class__.__name__} cannot be pickled, it restarts on restore.")
+                activation_dist = None
+            placements.append({"next_activation": placement.next_activation, "activation_dist": activation_dist})
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "now": self.env.now,
+            "random": random.getstate(),
+            "numpy_random": np.random.get_state(),
+            "path_lengths": self.path_lengths,
+            "apps": [app.name for app in self.apps],
+            "sources": [{
+                "distribution": app.source.distribution,
+                "next_emission": app.source.next_emission,
+                "batcher": app.source.batcher.get_state() if app.source.batcher else None,
+            } for app in self.apps],
+            "operators": [[{
+                "node": nodes.get(operator.node),
+                "batcher": operator.batcher.get_state() if operator.batcher else None,
+            } for operator in app.operators] for app in self.apps],
+            "placements": placements,
+            "nodes": [_encode_resource(node.get_state(), encode_message) for node in self.network],
+            "links": [
+                _encode_resource(link.model.get_state(), lambda t: (encode_message(t.message), [nodes[n] for n in t.path], t.hop))
+                for _, _, link in self.network.edges(data="link")
+            ],
+            "event_log": self.event_log.get_state(nodes.__getitem__),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        logger.info(f"Wrote checkpoint '{path}'.")
+
+    def restore(self, path: str) -> None:
+        """Restores the state written by `checkpoint()`, e.g. to resume a simulation which crashed or was preempted.
+
+        The simulation has to be set up exactly like the checkpointed one - same network, applications (in the same order),
+        placements and type of event log - and must not have been run yet. Counters of the `Instrumentation` start at zero.
+        """
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        self._check_checkpoint(state)
+
+        # Processes of the new simulation are discarded with its environment, the checkpointed ones are resumed instead
+        self.env = simpy.Environment(initial_time=state["now"])
+        time_filter.env = self.env
+        self._prepare_network(self.network, self.queue_trace, self.link_model)
+        self.selection.set_env(self.env)
+        if self.instrumentation is not None:
+            self.instrumentation.set_env(self.env)
+        random.setstate(state["random"])
+        np.random.set_state(state["numpy_random"])
+        self.path_lengths = state["path_lengths"]
+
+        nodes = list(self.network)
+        self._restore_modules(state, nodes)
+        self._restore_placements(state)
+        self._restore_resources(state, nodes)
+        self.event_log.set_state(state["event_log"], nodes.__getitem__)
+        logger.info(f"Restored checkpoint '{path}' at time {self.env.now}.")
+
+    def _check_checkpoint(self, state: Dict[str, Any]) -> None:
+        if state["version"] != CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint version {state['version']} is not supported.")
+        if self.env.now != 0:
+            raise ValueError("Only simulations which have not been run yet can be restored.")
+        if state["apps"] != [app.name for app in self.apps] or len(state["placements"]) != len(self.placements):
+            raise ValueError("The checkpoint was written by a simulation with different applications or placements.")
+
+    def _restore_modules(self, state: Dict[str, Any], nodes: List[Any]) -> None:
+        """Restores the placement of operators, pending batches and the processes of all sources"""
+        for app, operators in zip(self.apps, state["operators"]):
+            for operator, operator_state in zip(app.operators, operators):
+                operator.node = nodes[operator_state["node"]] if operator_state["node"] is not None else None
+                if operator.batcher:
+                    operator.batcher.set_state(operator_state["batcher"], app, self)
+        self.selection.update(self.network, self.apps)
+        for app, source_state in zip(self.apps, state["sources"]):
+            app.source.distribution = source_state["distribution"]
+            if app.source.batcher:
+                app.source.batcher.set_state(source_state["batcher"], app, self)
+            self.env.process(app.source.run(self, app, source_state["next_emission"]))
+
+    def _restore_placements(self, state: Dict[str, Any]) -> None:
+        for placement, placement_state in zip(self.placements, state["placements"]):
+            if placement_state["activation_dist"] is not None:
+                placement.activation_dist = placement_state["activation_dist"]
+            if placement_state["next_activation"] is not None:
+                self.env.process(placement.run(self, placement_state["next_activation"]))
+
+    def _restore_resources(self, state: Dict[str, Any], nodes: List[Any]) -> None:
+        """Restores nodes and links and resumes the messages which were processed or transmitted"""
+        decode_message = self._message_decoder()
+        for node, node_state in zip(nodes, state["nodes"]):
+            node.set_state(node_state)
+            for job, encoded in _decode_jobs(node_state):
+                job.owner = decode_message(encoded)
+                self.env.process(job.owner.dst.enter(job.owner, self, job))
+        for (_, _, link), link_state in zip(self.network.edges(data="link"), state["links"]):
+            link.model.set_state(link_state)
+            for job, (message, path, hop) in _decode_jobs(link_state):
+                job.owner = Transmission(decode_message(message), [nodes[i] for i in path], hop)
+                self.env.process(self._transmit(job.owner, job))
+
+    def _modules(self) -> Dict[Tuple[int, int], Module]:
+        """Maps (application index, module index) to all modules, modules are numbered source, operators, sink"""
+        return {(i, j): module for i, app in enumerate(self.apps) for j, module in enumerate([app.source] + app.operators + [app.sink])}
+
+    def _message_encoder(self) -> Callable[[MessageInstance], Dict[str, Any]]:
+        module_keys = {module: key for key, module in self._modules().items()}
+        app_keys = {app: i for i, app in enumerate(self.apps)}
+
+        def encode(message: MessageInstance) -> Dict[str, Any]:
+            state = {slot: getattr(message, slot) for slot in MessageInstance.__slots__}
+            state["dst"] = module_keys[message.dst]
+            state["application"] = app_keys[message.application]
+            return state
+
+        return encode
+
+    def _message_decoder(self) -> Callable[[Dict[str, Any]], MessageInstance]:
+        modules = self._modules()
+
+        def decode(state: Dict[str, Any]) -> MessageInstance:
+            message = MessageInstance.__new__(MessageInstance)
+            for slot, value in state.items():
+                setattr(message, slot, value)
+            message.dst = modules[state["dst"]]
+            message.application = self.apps[state["application"]]
+            return message
+
+        return decode
+
+    def _prepare_network(
+        self, network: nx.Graph, queue_trace: Optional[Callable[[], QueueTrace]] = None, link_model: Type[LinkModel] = StoreAndForward
+    ) -> nx.Graph:
         for node in network:
-            node.set_env(self.env)
+            node.set_env(self.env, queue_trace)
         for _, _, data in network.edges(data=True):
-            data["link"].set_env(self.env)
+            data["link"].set_env(self.env, queue_trace, link_model)
         return network
+
+
+def _encode_resource(state: Dict[str, Any], encode_owner: Callable[[Any], Any]) -> Dict[str, Any]:
+    """Replaces the jobs of a link or node state by tuples, with their owners encoded"""
+    state["jobs"] = [
+        (encode_owner(job.owner), job.work, job.queued, job.priority, job.started, job.until, job.remaining) for job in state["jobs"]
+    ]
+    return state
+
+
+def _decode_jobs(state: Dict[str, Any]) -> List[Tuple[Job, Any]]:
+    """Returns the jobs of a link or node state (without owner) together with their encoded owners"""
+    return [(Job(None, *values), owner) for owner, *values in state["jobs"]]
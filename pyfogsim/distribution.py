@@ -1,8 +1,18 @@
+import math
 import random
 from abc import ABC, abstractmethod
+from copy import copy
+from typing import Union, Sequence
+
+import numpy as np
 
 
 class Distribution(ABC):
+    """Iterator over random values, e.g. inter-arrival times of messages.
+
+    Distributions may expose their expected value as `mean`, which is used by analytic models such as the `LatencyModel`
+    of the placement.
+    """
 
     def __iter__(self):
         return self
@@ -19,6 +29,10 @@ class DeterministicDistribution(Distribution):
     def __next__(self):
         return self.time
 
+    @property
+    def mean(self):
+        return self.time
+
 
 class UniformDistribution(Distribution):
     def __init__(self, min, max):
@@ -27,3 +41,125 @@ class UniformDistribution(Distribution):
 
     def __next__(self):
         return random.uniform(self.min, self.max)
+
+    @property
+    def mean(self):
+        return (self.min + self.max) / 2
+
+
+class NumpyDistribution(Distribution):
+    """Base class for distributions which draw their samples in blocks from their own `numpy.random.Generator`.
+
+    Use `spawn()` to derive an independent, reproducible stream for every source, so results do not depend on the
+    order in which simulation processes draw samples.
+
+    Args:
+        seed: Seed or `numpy.random.SeedSequence` of the random stream
+        block_size: Number of samples drawn at once
+    """
+
+    def __init__(self, seed: Union[None, int, np.random.SeedSequence] = None, block_size: int = 4096):
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self.block_size = block_size
+        self._block = []
+        self._index = 0
+
+    def __next__(self):
+        if self._index == len(self._block):
+            self._block = self._draw(self.block_size).tolist()
+            self._index = 0
+        value = self._block[self._index]
+        self._index += 1
+        return value
+
+    def spawn(self) -> "NumpyDistribution":
+        """Returns a copy of this distribution with an independent random stream derived from this distribution's seed"""
+        distribution = copy(self)
+        NumpyDistribution.__init__(distribution, self.seed_sequence.spawn(1)[0], self.block_size)
+        return distribution
+
+    @abstractmethod
+    def _draw(self, n: int) -> np.ndarray:
+        """Draws the next *n* samples"""
+
+
+class NumpyUniformDistribution(NumpyDistribution):
+    def __init__(self, min, max, **kwargs):
+        super().__init__(**kwargs)
+        self.min = min
+        self.max = max
+
+    @property
+    def mean(self):
+        return (self.min + self.max) / 2
+
+    def _draw(self, n: int) -> np.ndarray:
+        return self.rng.uniform(self.min, self.max, size=n)
+
+
+class NumpyExponentialDistribution(NumpyDistribution):
+    """Exponentially distributed inter-arrival times, i.e. arrivals according to a Poisson process with rate 1/*mean*"""
+
+    def __init__(self, mean, **kwargs):
+        super().__init__(**kwargs)
+        self.mean = mean
+
+    def _draw(self, n: int) -> np.ndarray:
+        return self.rng.exponential(self.mean, size=n)
+
+
+class NumpyNormalDistribution(NumpyDistribution):
+    """Normally distributed values, clipped at *min* as simulation timeouts must not be negative.
+
+    Args:
+        mean: Mean of the normal distribution before clipping
+        std: Standard deviation of the normal distribution before clipping
+        min: Smaller values are replaced by *min*
+    """
+
+    def __init__(self, mean, std, min=0, **kwargs):
+        super().__init__(**kwargs)
+        self.mu = mean
+        self.std = std
+        self.min = min
+
+    @property
+    def mean(self):
+        """Expected value of the clipped samples, which exceeds *mu* if a noticeable part of the distribution lies below *min*"""
+        if self.std == 0:
+            return max(self.mu, self.min)
+        alpha = (self.min - self.mu) / self.std
+        cdf = (1 + math.erf(alpha / math.sqrt(2))) / 2
+        pdf = math.exp(-alpha ** 2 / 2) / math.sqrt(2 * math.pi)
+        return self.min * cdf + self.mu * (1 - cdf) + self.std * pdf
+
+    def _draw(self, n: int) -> np.ndarray:
+        return np.maximum(self.rng.normal(self.mu, self.std, size=n), self.min)
+
+
+class NumpyEmpiricalDistribution(NumpyDistribution):
+    """Replays the values of a recorded trace.
+
+    Args:
+        trace: Recorded values, e.g. inter-arrival times
+        resample: If False, the trace is replayed in order and repeated once exhausted. If True, values are drawn from
+            the trace at random (with replacement).
+    """
+
+    def __init__(self, trace: Sequence[float], resample: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.trace = np.asarray(trace, dtype=float)
+        self.resample = resample
+        self._offset = 0
+
+    @property
+    def mean(self):
+        return float(self.trace.mean())
+
+    def _draw(self, n: int) -> np.ndarray:
+        if self.resample:
+            return self.rng.choice(self.trace, size=n)
+        indices = (self._offset + np.arange(n)) % len(self.trace)
+        self._offset = (self._offset + n) % len(self.trace)
+        return self.trace[indices]
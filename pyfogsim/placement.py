@@ -1,10 +1,13 @@
 import logging
 from abc import abstractmethod, ABC
-from typing import Iterator, List
+from heapq import heapify, heappush, heappop
+from typing import Iterator, List, Iterable, Dict, Tuple, Optional, Callable, Any
 
 import networkx as nx
+import numpy as np
 
 from pyfogsim.application import Application
+from pyfogsim.resource import Node, Sensor
 
 logger = logging.getLogger(__name__)
 
@@ -25,19 +28,37 @@ class Placement(ABC):
     def __init__(self, apps: List[Application], activation_dist: Iterator = None):
         self.apps = apps
         self.activation_dist = activation_dist
+        self.next_activation = None  # Time of the next invocation of *run*
 
-    def run(self, simulation: "Simulation"):
-        """This method will be invoked during the simulation to change the assignment of the modules to the topology."""
-        self._initial_allocation(simulation)
+    def run(self, simulation: "Simulation", next_activation: Optional[float] = None):
+        """This method will be invoked during the simulation to change the assignment of the modules to the topology.
+
+        Args:
+            next_activation: Only when resuming from a checkpoint: The initial allocation is skipped and the placement is
+                first run at this time
+        """
+        if next_activation is None:
+            self._initial_allocation(simulation)
+            simulation.selection.update(simulation.network, simulation.apps)
+        else:
+            self.next_activation = next_activation
+            yield simulation.env.timeout(next_activation - simulation.env.now)
+            self._activate(simulation)
         if self.activation_dist:
             while True:
                 try:
-                    next_activation = next(self.activation_dist)
+                    delay = next(self.activation_dist)
                 except StopIteration:
                     break
                 else:
-                    yield simulation.env.timeout(next_activation)
-                    self._run(simulation)
+                    self.next_activation = simulation.env.now + delay
+                    yield simulation.env.timeout(delay)
+                    self._activate(simulation)
+        self.next_activation = None
+
+    def _activate(self, simulation: "Simulation"):
+        self._run(simulation)
+        simulation.selection.update(simulation.network, simulation.apps)
 
     def _initial_allocation(self, simulation: "Simulation"):  # TODO Why does this know about the simulation?
         """Given an ecosystem, it starts the allocation of modules in the topology."""
@@ -48,25 +69,409 @@ class Placement(ABC):
         """This method will be invoked during the simulation to change the assignment of the modules to the topology."""
 
 
+class CapacityIndex:
+    """Priority index over nodes which finds the best host for a module in O(log n).
+
+    The index keeps track of the remaining RAM of every node while modules are allocated. It is meant to be built once per
+    placement round.
+
+    Args:
+        nodes: Candidate nodes
+        key: Nodes with the highest value are preferred, one of "ipt", "ram" or "remaining_ram". Ties are broken by the
+            order of *nodes*.
+    """
+
+    KEYS = {
+        "ipt": lambda node, remaining_ram: node.ipt,
+        "ram": lambda node, remaining_ram: node.ram,
+        "remaining_ram": lambda node, remaining_ram: remaining_ram,
+    }
+
+    def __init__(self, nodes: Iterable[Node], key: str = "ipt"):
+        self.key = self.KEYS[key]
+        self.remaining_ram: Dict[Node, int] = {}
+        self._order: Dict[Node, int] = {}
+        self._entries: Dict[Node, Tuple] = {}  # Current heap entry of every node, outdated entries are skipped
+        heap = []
+        for i, node in enumerate(nodes):
+            self.remaining_ram[node] = node.ram
+            self._order[node] = i
+            self._entries[node] = (-self.key(node, node.ram), i, node)
+            heap.append(self._entries[node])
+        heapify(heap)
+        self._heap = heap
+
+    def __len__(self):
+        return len(self._entries)
+
+    def best(self, ram: int = 0) -> Node:
+        """Returns the preferred node with at least *ram* MB remaining"""
+        skipped = []
+        try:
+            while self._heap:
+                entry = self._heap[0]
+                node = entry[2]
+                if self._entries.get(node) is not entry:
+                    heappop(self._heap)
+                elif self.remaining_ram[node] < ram:
+                    skipped.append(heappop(self._heap))
+                else:
+                    return node
+            raise ValueError(f"No node with {ram} MB of remaining RAM.")
+        finally:
+            for entry in skipped:
+                heappush(self._heap, entry)
+
+    def allocate(self, node: Node, ram: int) -> None:
+        """Reserves *ram* MB on the node"""
+        self.remaining_ram[node] -= ram
+        if self.key is self.KEYS["remaining_ram"]:
+            entry = self._entries[node] = (-self.remaining_ram[node], self._order[node], node)
+            heappush(self._heap, entry)
+
+    def remove(self, node: Node) -> None:
+        """Removes the node from the index"""
+        del self._entries[node]
+
+
 class CloudPlacement(Placement):
-    """Locates the operator of the application in the node with the highest processing power"""
+    """Locates the operator of the application in the node with the highest processing power (and enough RAM)"""
 
     def _run(self, simulation: "Simulation"):
         logger.debug(f"CloudPlacement placing {len(self.apps)} applications.")
+        index = CapacityIndex(simulation.network, key="ipt")
         for app in self.apps:
-            cloud_node_id, _ = max(simulation.network.nodes(data=True), key=lambda node: node[1]["IPT"])
             for operator in app.operators:
-                logger.debug(f"CloudPlacement placing operator '{operator.name}' at node '{cloud_node_id}'.")
-                operator.node = cloud_node_id
+                node = index.best(operator.ram)
+                index.allocate(node, operator.ram)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"CloudPlacement placing operator '{operator.name}' at node '{node}'.")
+                operator.node = node
 
 
 class EdgePlacement(Placement):  # TODO First implementation, now very sophisticated
-    """Locates the services of the application in the first hop on the shortest path to the destination"""
+    """Locates the services of the application in the first hop on the shortest path to the destination
+
+    Args:
+        apps: List of applications to place on the network
+        activation_dist: a distribution function to active the *run* function in execution time
+        bulk: If True, a single shortest path tree is computed per distinct sink node and the first hops of all
+            applications are read from it, instead of searching one path per application. If there are several shortest
+            paths, the chosen first hop may differ from the per-application search.
+    """
+
+    def __init__(self, apps: List[Application], activation_dist: Iterator = None, bulk: bool = False):
+        super().__init__(apps, activation_dist)
+        self.bulk = bulk
 
     def _run(self, simulation: "Simulation"):
         logger.debug(f"EdgePlacement placing {len(self.apps)} applications.")
+        first_hops = self._bulk_first_hops(simulation.network) if self.bulk else None
         for app in self.apps:
-            path = nx.shortest_path(simulation.network, source=app.source.node, target=app.sink.node)
+            if first_hops is not None:
+                first_hop = first_hops[app]
+            else:
+                first_hop = nx.shortest_path(simulation.network, source=app.source.node, target=app.sink.node)[1]
             for operator in app.operators:
-                logger.debug(f"EdgePlacement placing operator '{operator.name}' at node '{path[1]}'.")
-                operator.node = path[1]
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"EdgePlacement placing operator '{operator.name}' at node '{first_hop}'.")
+                operator.node = first_hop
+
+    def _bulk_first_hops(self, G: nx.Graph) -> Dict[Application, Node]:
+        """Returns the first hop of every application from one shortest path tree per sink node"""
+        apps_by_sink = {}
+        for app in self.apps:
+            apps_by_sink.setdefault(app.sink.node, []).append(app)
+        reverse = G.reverse(copy=False) if G.is_directed() else G
+        first_hops = {}
+        for sink_node, apps in apps_by_sink.items():
+            paths = nx.single_source_shortest_path(reverse, sink_node)  # Paths from the sink to all nodes, read backwards
+            for app in apps:
+                try:
+                    first_hops[app] = paths[app.source.node][-2]
+                except KeyError:
+                    raise nx.NetworkXNoPath(f"Target {sink_node} cannot be reached from source {app.source.node}.")
+        return first_hops
+
+
+class LatencyModel:
+    """Analytic model of the expected end-to-end latency of applications for a placement of their operators.
+
+    The operators of all applications are flattened into NumPy arrays, so a placement - an array holding the index of the
+    candidate node of every operator in `operators` - is evaluated without running a simulation:
+
+    - Messages follow the path with the fewest hops, like `ShortestPath`. Every link on the path adds its latency plus
+      size / bandwidth, congestion of links is not modelled.
+    - Every node is modelled as an M/M/1 queue: The processing time of an operator is stretched by 1 / (1 - utilization)
+      of its node. The utilization follows from the instructions of the operators and the mean inter-arrival time of
+      their sources, so the distributions of all sources must provide a `mean`.
+
+    Args:
+        G: Network topology
+        apps: Applications whose operators are placed
+        candidates: Nodes which may host operators
+        max_utilization: Maximum CPU utilization of a node, placements which exceed it are infeasible
+    """
+
+    PENALTY = 1e9  # Cost per unit of exceeded CPU or RAM capacity
+
+    def __init__(self, G: nx.Graph, apps: List[Application], candidates: List[Node], max_utilization: float = 0.9):
+        self.candidates = candidates
+        self.max_utilization = max_utilization
+        self.capacity = np.array([node.ipt * node.cores for node in candidates], dtype=float)
+        self.ipt = np.array([node.ipt for node in candidates], dtype=float)
+        self.ram = np.array([node.ram for node in candidates], dtype=float)
+
+        columns = {}  # Column in the distance matrices of every node messages are sent from or to
+
+        def column(node):
+            return columns.setdefault(node, len(columns))
+
+        candidate_columns = [column(node) for node in candidates]
+        self.operators = []
+        rate, instructions, ram, size_in, size_out, src_col, sink_col, prev, next_ = [], [], [], [], [], [], [], [], []
+        for app in apps:
+            if not app.operators:
+                continue
+            app_rate = 1 / app.source.distribution.mean
+            message = app.source.message_out
+            for i, operator in enumerate(app.operators):
+                index = len(self.operators)
+                self.operators.append(operator)
+                rate.append(app_rate)
+                instructions.append(message.instructions)
+                ram.append(operator.ram)
+                size_in.append(message.size)
+                size_out.append(operator.message_out.size)
+                src_col.append(column(app.source.node))
+                sink_col.append(column(app.sink.node))
+                prev.append(index - 1 if i > 0 else -1)
+                next_.append(index + 1 if i < len(app.operators) - 1 else -1)
+                message = operator.message_out
+        self.rate = np.array(rate, dtype=float)
+        self.instructions = np.array(instructions, dtype=float)
+        self.work = self.rate * self.instructions  # Instructions per time unit
+        self.operator_ram = np.array(ram, dtype=float)
+        self.size_in = np.array(size_in, dtype=float)
+        self.size_out = np.array(size_out, dtype=float)
+        self.src_col = np.array(src_col, dtype=int)
+        self.sink_col = np.array(sink_col, dtype=int)
+        self.prev = np.array(prev, dtype=int)
+        self.next = np.array(next_, dtype=int)
+        self.total_rate = float(self.rate[self.prev == -1].sum())
+        self.candidate_columns = np.array(candidate_columns, dtype=int)
+        self.latency, self.inverse_bandwidth = self._distances(G, candidates, columns)
+
+    def __len__(self):
+        return len(self.operators)
+
+    @staticmethod
+    def _distances(G: nx.Graph, candidates: List[Node], columns: Dict[Any, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Sums of link latencies and of inverse bandwidths along the paths from every candidate to every column node.
+
+        Runs a breadth-first search from all candidates at once, one vectorized step over all edges per hop.
+        """
+        position = {node: i for i, node in enumerate(G)}
+        links = [(position[u], position[v], link) for u, v, link in G.edges(data="link")]
+        src = np.array([u for u, _, _ in links] + [v for _, v, _ in links], dtype=int)
+        dst = np.array([v for _, v, _ in links] + [u for u, _, _ in links], dtype=int)
+        link_latency = np.tile([link.latency for _, _, link in links], 2).astype(float)
+        link_inverse_bandwidth = np.tile([1 / link.bandwidth for _, _, link in links], 2)
+
+        rows = np.arange(len(candidates))
+        hops = np.full((len(candidates), len(position)), -1)
+        hops[rows, [position[node] for node in candidates]] = 0
+        latency = np.zeros(hops.shape)
+        inverse_bandwidth = np.zeros(hops.shape)
+        level = 0
+        while True:
+            candidate, edge = np.nonzero((hops[:, src] == level) & (hops[:, dst] == -1))
+            if len(candidate) == 0:
+                break
+            u, v = src[edge], dst[edge]
+            hops[candidate, v] = level + 1
+            latency[candidate, v] = latency[candidate, u] + link_latency[edge]
+            inverse_bandwidth[candidate, v] = inverse_bandwidth[candidate, u] + link_inverse_bandwidth[edge]
+            level += 1
+
+        column_positions = np.array([position[node] for node in columns], dtype=int)  # Columns are numbered in insertion order
+        unreachable = hops[:, column_positions] == -1
+        latency = np.where(unreachable, np.inf, latency[:, column_positions])
+        inverse_bandwidth = np.where(unreachable, np.inf, inverse_bandwidth[:, column_positions])
+        return latency, inverse_bandwidth
+
+    def _transmission(self, candidates: np.ndarray, columns: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        return self.latency[candidates, columns] + sizes * self.inverse_bandwidth[candidates, columns]
+
+    def _neighbour_columns(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Columns of the nodes every operator receives messages from and sends messages to"""
+        in_col = np.where(self.prev >= 0, self.candidate_columns[x[self.prev]], self.src_col)
+        out_col = np.where(self.next >= 0, self.candidate_columns[x[self.next]], self.sink_col)
+        return in_col, out_col
+
+    def _node_cost(self, work: np.ndarray, ram: np.ndarray, nodes: Optional[np.ndarray] = None) -> np.ndarray:
+        """Rate-weighted processing time plus penalties on the given nodes with the given load"""
+        nodes = slice(None) if nodes is None else nodes
+        capacity = self.capacity[nodes]
+        utilization = np.minimum(work / capacity, self.max_utilization)
+        cpu_excess = np.maximum(work - self.max_utilization * capacity, 0) / capacity
+        ram_excess = np.maximum(ram - self.ram[nodes], 0)
+        return work / self.ipt[nodes] / (1 - utilization) + self.PENALTY * (cpu_excess + ram_excess)
+
+    def load(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the work (instructions per time unit) and the RAM allocated on every candidate"""
+        n = len(self.candidates)
+        return np.bincount(x, weights=self.work, minlength=n), np.bincount(x, weights=self.operator_ram, minlength=n)
+
+    def cost(self, x: np.ndarray) -> float:
+        """Rate-weighted sum of the expected latencies of all messages plus penalties for exceeded capacities"""
+        in_col, _ = self._neighbour_columns(x)
+        transmissions = self.rate * self._transmission(x, in_col, self.size_in)
+        last = self.next == -1
+        transmissions[last] += self.rate[last] * self._transmission(x[last], self.sink_col[last], self.size_out[last])
+        return float(transmissions.sum() + self._node_cost(*self.load(x)).sum())
+
+    def feasible(self, x: np.ndarray) -> bool:
+        work, ram = self.load(x)
+        return bool(np.all(work <= self.max_utilization * self.capacity) and np.all(ram <= self.ram))
+
+    def expected_latency(self, x: np.ndarray) -> float:
+        """Expected end-to-end latency of a message, averaged over all applications weighted by their message rate"""
+        return self.cost(x) / self.total_rate
+
+    def greedy(self) -> np.ndarray:
+        """Places the operators one after another, heaviest application first, on the feasible candidate with the lowest
+        expected latency. The outgoing transmission is only accounted for the last operator of an application.
+
+        Raises:
+            ValueError: If an operator fits on no candidate
+        """
+        x = np.full(len(self), -1, dtype=int)
+        work = np.zeros(len(self.candidates))
+        ram = np.zeros(len(self.candidates))
+        all_candidates = np.arange(len(self.candidates))
+        firsts = np.flatnonzero(self.prev == -1)
+        app_work = np.add.reduceat(self.work, firsts) if len(firsts) else np.empty(0)
+        for first in firsts[np.argsort(-app_work, kind="stable")]:
+            o = first
+            while o != -1:
+                in_col = self.candidate_columns[x[self.prev[o]]] if self.prev[o] >= 0 else self.src_col[o]
+                cost = self._transmission(all_candidates, in_col, self.size_in[o])
+                if self.next[o] == -1:
+                    cost += self._transmission(all_candidates, self.sink_col[o], self.size_out[o])
+                new_work = work + self.work[o]
+                cost += self.instructions[o] / self.ipt / (1 - np.minimum(new_work / self.capacity, self.max_utilization))
+                feasible = (new_work <= self.max_utilization * self.capacity) & (ram + self.operator_ram[o] <= self.ram)
+                if not feasible.any():
+                    raise ValueError(f"No candidate node has enough capacity left for operator '{self.operators[o].name}'.")
+                x[o] = best = np.argmin(np.where(feasible, cost, np.inf))
+                work[best] += self.work[o]
+                ram[best] += self.operator_ram[o]
+                o = self.next[o]
+        return x
+
+    def anneal(
+        self, x: np.ndarray, iterations: int = 1000, batch_size: int = 32, temperature: float = 0.1, seed: Optional[int] = None
+    ) -> np.ndarray:
+        """Improves a placement via simulated annealing and returns the best feasible placement found.
+
+        Every iteration proposes to move a batch of random operators to random candidates. The cost change of all moves is
+        evaluated at once on the current state, moves are accepted according to the Metropolis criterion and at most one
+        accepted move per target node is applied.
+
+        Args:
+            x: Initial placement, e.g. from `greedy()`
+            iterations: Number of batches
+            batch_size: Number of moves proposed per batch
+            temperature: Initial temperature relative to the mean cost per operator, cools down geometrically to 1/1000 of it
+            seed: Seed of the random number generator
+        """
+        rng = np.random.default_rng(seed)
+        x = x.copy()
+        cost = self.cost(x)
+        best, best_cost = (x.copy(), cost) if self.feasible(x) else (None, np.inf)
+        t0 = temperature * cost / max(len(self), 1)
+        batch_size = min(batch_size, len(self))
+        for k in range(iterations):
+            operators = rng.choice(len(self), size=batch_size, replace=False)
+            old = x[operators]
+            new = rng.integers(len(self.candidates), size=batch_size)
+            delta = self._move_delta(x, operators, old, new)
+            t = t0 * 1e-3 ** (k / iterations)
+            accept = (new != old) & ((delta < 0) | (rng.random(batch_size) < np.exp(-np.maximum(delta, 0) / max(t, 1e-300))))
+            if not accept.any():
+                continue
+            _, first = np.unique(new[accept], return_index=True)
+            moved = np.flatnonzero(accept)[first]
+            x[operators[moved]] = new[moved]
+            cost = self.cost(x)
+            if cost < best_cost and self.feasible(x):
+                best, best_cost = x.copy(), cost
+        if best is None:
+            raise ValueError("Found no feasible placement.")
+        return best
+
+    def _move_delta(self, x: np.ndarray, operators: np.ndarray, old: np.ndarray, new: np.ndarray) -> np.ndarray:
+        """Cost change of every single move of an operator from candidate *old* to *new*, all other operators fixed"""
+        in_col, out_col = self._neighbour_columns(x)
+        in_col, out_col = in_col[operators], out_col[operators]
+        rate = self.rate[operators]
+        size_out = self.size_out[operators]
+        size_in = self.size_in[operators]
+        delta = rate * (
+            self._transmission(new, in_col, size_in) - self._transmission(old, in_col, size_in)
+            + self._transmission(new, out_col, size_out) - self._transmission(old, out_col, size_out)
+        )
+        work, ram = self.load(x)
+        w, r = self.work[operators], self.operator_ram[operators]
+        delta += self._node_cost(work[old] - w, ram[old] - r, old) - self._node_cost(work[old], ram[old], old)
+        delta += self._node_cost(work[new] + w, ram[new] + r, new) - self._node_cost(work[new], ram[new], new)
+        return delta
+
+
+class OptimizedPlacement(Placement):
+    """Places operators under RAM and CPU constraints such that the expected end-to-end latency of the `LatencyModel` is
+    minimal. The sources of all applications need a distribution with a `mean`.
+
+    Args:
+        apps: List of applications to place on the network
+        activation_dist: a distribution function to active the *run* function in execution time
+        method: "greedy" places operators one after another on the best feasible node, "annealing" improves the greedy
+            placement via simulated annealing
+        candidates: Filter for the nodes which may host operators, by default all nodes but sensors
+        max_utilization: Maximum expected CPU utilization of a node
+        iterations: Only for "annealing": Number of iterations
+        seed: Only for "annealing": Seed of the random number generator
+    """
+
+    def __init__(
+        self,
+        apps: List[Application],
+        activation_dist: Iterator = None,
+        method: str = "greedy",
+        candidates: Optional[Callable[[Node], bool]] = None,
+        max_utilization: float = 0.9,
+        iterations: int = 1000,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(apps, activation_dist)
+        if method not in ("greedy", "annealing"):
+            raise ValueError(f"Unknown method '{method}'.")
+        self.method = method
+        self.candidates = candidates if candidates is not None else (lambda node: not isinstance(node, Sensor))
+        self.max_utilization = max_utilization
+        self.iterations = iterations
+        self.seed = seed
+
+    def _run(self, simulation: "Simulation"):
+        logger.debug(f"OptimizedPlacement placing {len(self.apps)} applications.")
+        candidates = [node for node in simulation.network if self.candidates(node)]
+        model = LatencyModel(simulation.network, self.apps, candidates, self.max_utilization)
+        x = model.greedy()
+        if self.method == "annealing":
+            x = model.anneal(x, iterations=self.iterations, seed=self.seed)
+        for operator, i in zip(model.operators, x):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"OptimizedPlacement placing operator '{operator.name}' at node '{candidates[i]}'.")
+            operator.node = candidates[i]
+        logger.debug(f"OptimizedPlacement expects a latency of {model.expected_latency(x):.3f}.")
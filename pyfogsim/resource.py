@@ -1,36 +1,352 @@
-from contextlib import contextmanager
-from copy import copy
-
-from simpy import Environment, Resource
-
-
-class MonitoredResource(Resource):
-    def __init__(self, *args, **kwargs):
+from abc import ABC, abstractmethod
+from collections import deque
+from heapq import heappush, heappop
+from itertools import count
+from typing import Optional, Callable, List, Tuple, Generator, Any, Type, Dict
+
+from simpy import Environment, Resource, PriorityResource, Event
+
+
+class QueueTrace:
+    """Records the queue length of a `MonitoredResource` over time.
+
+    Without arguments every change is recorded, which grows linearly with the simulated time.
+
+    Args:
+        interval: If set, the queue length is sampled every *interval* time units instead of on every change
+        window: If set, only the last *window* samples are kept
+    """
+
+    def __init__(self, interval: Optional[float] = None, window: Optional[int] = None):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self._next_sample = 0
+
+    def __iter__(self):
+        return iter(self.samples)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def record(self, now: float, length: int) -> None:
+        """Invoked right before the queue length changes, *length* is the length which held until *now*"""
+        if self.interval is None:
+            self.samples.append((now, length))
+            return
+        # A sample at *now* takes the length after the change, which is only known at the next change
+        while self._next_sample < now:
+            self.samples.append((self._next_sample, length))
+            self._next_sample += self.interval
+
+
+class Job:
+    """A message which waits for or is served by a link or node.
+
+    Link models and schedulers keep their jobs explicitly (in order of arrival), so the state of a simulation can be
+    checkpointed and resumed without pickling simpy processes.
+
+    Args:
+        owner: What the job belongs to, e.g. the transmission or message which is resumed with it
+        work: Size in bytes or number of instructions
+        queued: Simulation time the job arrived
+        priority: Priority on nodes with a `PriorityScheduler`
+        started: Simulation time the job's service started, None while it is waiting. On shared capacities, the time its
+            shared phase finished.
+        until: End of the job's current timeout, if any
+        remaining: Remaining work on a shared capacity, only set in checkpoints
+    """
+
+    __slots__ = ("owner", "work", "queued", "priority", "started", "until", "remaining", "event")
+
+    def __init__(
+        self,
+        owner: Any,
+        work: float,
+        queued: float,
+        priority: int = 0,
+        started: Optional[float] = None,
+        until: Optional[float] = None,
+        remaining: Optional[float] = None,
+    ):
+        self.owner = owner
+        self.work = work
+        self.queued = queued
+        self.priority = priority
+        self.started = started
+        self.until = until
+        self.remaining = remaining
+        self.event = None  # Completion event while the job is processed by a `SharedCapacity`
+
+    def copy(self, remaining: Optional[float] = None) -> "Job":
+        return Job(self.owner, self.work, self.queued, self.priority, self.started, self.until, remaining)
+
+
+class _Monitored:
+    """Mixin for simpy resources which keeps track of their utilization in constant time and memory.
+
+    Args:
+        trace: Optional `QueueTrace` which records the queue length over time
+    """
+
+    def __init__(self, *args, trace: Optional[QueueTrace] = None, **kwargs):
         super().__init__(*args, **kwargs)
-        self.queue_over_time = []
-        self.start = None
-        self.usage_log = []
+        self.trace = trace
+        self.busy_area = 0  # Integral of the number of users over time
+        self._last_change = self._env.now
 
     @property
     def usage(self):
-        log = copy(self.usage_log)
-        if self.start is not None:
-            log.append((self.start, self._env.now))
-        return sum(e - s for s, e in log) / self._env.now
+        busy_area = self.busy_area + self.count * (self._env.now - self._last_change)
+        return busy_area / (self.capacity * self._env.now)
+
+    @property
+    def queue_over_time(self) -> List[Tuple[float, int]]:
+        return list(self.trace) if self.trace is not None else []
 
     def request(self, *args, **kwargs):
-        self.queue_over_time.append((self._env.now, len(self.queue)))
-        if self.start is None:
-            self.start = self._env.now
+        self._update()
         return super().request(*args, **kwargs)
 
     def release(self, *args, **kwargs):
-        self.queue_over_time.append((self._env.now, len(self.queue)))
-        if self.start is not None and len(self.queue) == 0:
-            self.usage_log.append((self.start, self._env.now))
-            self.start = None
+        self._update()
         return super().release(*args, **kwargs)
 
+    def _update(self):
+        if self.trace is not None:
+            self.trace.record(self._env.now, len(self.queue))
+        self.busy_area += self.count * (self._env.now - self._last_change)
+        self._last_change = self._env.now
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"busy_area": self.busy_area + self.count * (self._env.now - self._last_change), "trace": self.trace}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.busy_area = state["busy_area"]
+        self.trace = state["trace"]
+        self._last_change = self._env.now
+
+
+class MonitoredResource(_Monitored, Resource):
+    """Resource which keeps track of its utilization in constant time and memory"""
+
+
+class MonitoredPriorityResource(_Monitored, PriorityResource):
+    """Priority resource which keeps track of its utilization in constant time and memory"""
+
+
+class SharedCapacity:
+    """Fluid (processor sharing) server whose rate is shared equally by all active jobs.
+
+    With *servers* > 1, every job is processed at most at the full *rate*, i.e. with `n` active jobs each job gets
+    `rate * min(1, servers / n)`. Instead of tracking the remaining work of every job, the server keeps the "virtual time",
+    the work every active job received so far, so arrivals and departures cost O(log n).
+
+    Args:
+        env: Simulation environment
+        rate: Work units processed per time unit
+        servers: Number of jobs which can be processed at full rate in parallel
+        trace: Optional `QueueTrace` which records the number of active jobs over time
+    """
+
+    def __init__(self, env: Environment, rate: float, servers: int = 1, trace: Optional[QueueTrace] = None):
+        self.env = env
+        self.rate = rate
+        self.servers = servers
+        self.trace = trace
+        self.busy_area = 0  # Integral of the number of busy servers over time
+        self._jobs = []  # Heap of (virtual finish time, sequence number, event)
+        self._virtual_time = 0
+        self._last_update = env.now
+        self._sequence = count()
+        self._timer: Optional[Event] = None  # The single pending completion check
+        self._wakeup = None  # Time of the pending completion check
+
+    def __len__(self):
+        return len(self._jobs)
+
+    @property
+    def usage(self) -> float:
+        busy_area = self.busy_area + min(len(self._jobs), self.servers) * (self.env.now - self._last_update)
+        return busy_area / (self.servers * self.env.now)
+
+    def process(self, work: float) -> Event:
+        """Returns an event which succeeds once *work* units have been processed"""
+        event = self.env.event()
+        if work <= 0:
+            return event.succeed()
+        self._advance()
+        heappush(self._jobs, (self._virtual_time + work, next(self._sequence), event))
+        if self._timer is None or self._next_completion() < self._wakeup:
+            # Arrivals only delay the completion of active jobs, so the pending check is kept unless the new job finishes first
+            self._schedule()
+        return event
+
+    def remaining_work(self) -> Dict[Event, float]:
+        """Returns the remaining work of every active job by its completion event, in order of completion"""
+        virtual_time = self._virtual_time + (self._job_rate() * (self.env.now - self._last_update) if self._jobs else 0)
+        return {event: finish - virtual_time for finish, _, event in sorted(self._jobs)}
+
+    def get_state(self) -> Dict[str, Any]:
+        busy_area = self.busy_area + min(len(self._jobs), self.servers) * (self.env.now - self._last_update)
+        return {"busy_area": busy_area, "trace": self.trace}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """Restores the accounting of an idle capacity, active jobs are resumed by processing their remaining work"""
+        self.busy_area = state["busy_area"]
+        self.trace = state["trace"]
+        self._last_update = self.env.now
+
+    def _job_rate(self) -> float:
+        return self.rate * min(1, self.servers / len(self._jobs))
+
+    def _advance(self) -> None:
+        dt = self.env.now - self._last_update
+        if self._jobs:
+            self._virtual_time += self._job_rate() * dt
+            self.busy_area += min(len(self._jobs), self.servers) * dt
+        self._last_update = self.env.now
+        if self.trace is not None:
+            self.trace.record(self.env.now, len(self._jobs))
+
+    def _next_completion(self) -> float:
+        return self.env.now + max(self._jobs[0][0] - self._virtual_time, 0) / self._job_rate()
+
+    def _schedule(self) -> None:
+        """Schedules a check at the next completion, replacing the pending check"""
+        self._wakeup = self._next_completion()
+        self._timer = self.env.timeout(self._wakeup - self.env.now)
+        self._timer.callbacks.append(self._complete)
+
+    def _complete(self, timer: Event) -> None:
+        """Completes all finished jobs. Arrivals since the check was scheduled may have delayed the next completion, in which
+        case nothing finished yet and the check is just rescheduled."""
+        if timer is not self._timer:
+            return  # Replaced by an earlier check
+        self._timer = None
+        self._advance()
+        while self._jobs and self._jobs[0][0] <= self._virtual_time + 1e-9:
+            _, _, event = heappop(self._jobs)
+            event.succeed()
+        if self._jobs:
+            self._schedule()
+
+
+class LinkModel(ABC):
+    """Defines how messages share the capacity of a `Link`.
+
+    Args:
+        env: Simulation environment
+        link: The link this model belongs to
+        trace: Optional `QueueTrace` which records the queue length over time
+    """
+
+    def __init__(self, env: Environment, link: "Link", trace: Optional[QueueTrace] = None):
+        self.env = env
+        self.link = link
+        self.jobs: Dict[Job, None] = {}  # Jobs in order of arrival
+
+    @property
+    @abstractmethod
+    def usage(self) -> float:
+        """Fraction of the simulated time the link was in use"""
+
+    @property
+    @abstractmethod
+    def queue_length(self) -> int:
+        """Number of messages currently waiting for or being transmitted over this link"""
+
+    def transmit(self, size: int, owner: Any = None) -> Generator[Event, Any, Tuple[float, float]]:
+        """Transmits a message of *size* bytes over the link and returns its (queue time, latency)"""
+        return self.resume(Job(owner, size, self.env.now))
+
+    @abstractmethod
+    def resume(self, job: Job) -> Generator[Event, Any, Tuple[float, float]]:
+        """Transmits (the rest of) a job and returns its (queue time, latency)"""
+
+    @abstractmethod
+    def get_state(self) -> Dict[str, Any]:
+        """Returns the accounting state and copies of all jobs in the order in which they have to be resumed"""
+
+    @abstractmethod
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """Restores the accounting state, the jobs are resumed by the simulation"""
+
+
+class StoreAndForward(LinkModel):
+    """The link transmits one message at a time, every message occupies it for its latency plus its serialization time"""
+
+    def __init__(self, env: Environment, link: "Link", trace: Optional[QueueTrace] = None):
+        super().__init__(env, link, trace)
+        self.resource = MonitoredResource(env, trace=trace)
+
+    @property
+    def usage(self) -> float:
+        return self.resource.usage
+
+    @property
+    def queue_length(self) -> int:
+        return len(self.resource.queue) + self.resource.count
+
+    def resume(self, job: Job) -> Generator[Event, Any, Tuple[float, float]]:
+        latency = self.link.latency + job.work / self.link.bandwidth
+        self.jobs[job] = None
+        with self.resource.request() as req:
+            yield req
+            if job.started is None:
+                job.started = self.env.now
+                job.until = self.env.now + latency
+                yield self.env.timeout(latency)
+            else:
+                yield self.env.timeout(job.until - self.env.now)
+        del self.jobs[job]
+        return job.started - job.queued, latency
+
+    def get_state(self) -> Dict[str, Any]:
+        return _resource_state(self.resource, self.jobs)
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.resource.set_state(state["resource"])
+
+
+class FluidSharing(LinkModel):
+    """Fluid model: Concurrent messages share the bandwidth of the link equally, propagation latency does not occupy it.
+
+    The queue time of a message is the additional serialization time caused by sharing the bandwidth.
+    """
+
+    def __init__(self, env: Environment, link: "Link", trace: Optional[QueueTrace] = None):
+        super().__init__(env, link, trace)
+        self.capacity = SharedCapacity(env, rate=link.bandwidth, trace=trace)
+
+    @property
+    def usage(self) -> float:
+        return self.capacity.usage
+
+    @property
+    def queue_length(self) -> int:
+        return len(self.capacity)
+
+    def resume(self, job: Job) -> Generator[Event, Any, Tuple[float, float]]:
+        serialization = job.work / self.link.bandwidth
+        self.jobs[job] = None
+        if job.started is None:
+            job.event = self.capacity.process(job.work if job.remaining is None else job.remaining)
+            yield job.event
+            job.event = None
+            job.started = self.env.now
+            job.until = self.env.now + self.link.latency
+            yield self.env.timeout(self.link.latency)
+        else:
+            yield self.env.timeout(job.until - self.env.now)
+        del self.jobs[job]
+        return max(job.started - job.queued - serialization, 0), self.link.latency + serialization
+
+    def get_state(self) -> Dict[str, Any]:
+        return _capacity_state(self.capacity, self.jobs)
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.capacity.set_state(state["capacity"])
+
 
 class Link:
     def __init__(self, bandwidth: int, latency: int, watt_idle: int, watt_load: int):
@@ -40,33 +356,35 @@ class Link:
         self.watt_load = watt_load
 
         self.env = None
-        self._resource = None
-
-        self._time_under_use = 0
-        # self.x = []
+        self.model = None
 
     def __str__(self):
         return f"{self.__class__.__name__}"
 
     @property
     def usage(self) -> float:
-        return self._resource.usage
+        return self.model.usage
+
+    @property
+    def queue_length(self) -> int:
+        """Number of messages currently waiting for or being transmitted over this link"""
+        return self.model.queue_length
 
     @property
     def energy_consumption(self):
         return self.watt_idle + self.watt_load * self.usage
 
-    def set_env(self, env: Environment):
+    def set_env(self, env: Environment, queue_trace: Optional[Callable[[], QueueTrace]] = None, model: Type[LinkModel] = StoreAndForward):
         self.env = env
-        self._resource = MonitoredResource(env)
+        self.model = model(env, self, trace=queue_trace() if queue_trace else None)
 
-    @contextmanager
-    def request(self):
-        with self._resource.request() as req:
-            start = self.env.now
-            yield req
-            self._time_under_use += self.env.now - start
-            # self.x.append((start, self.env.now))
+    def transmit(self, size: int, owner: Any = None) -> Generator[Event, Any, Tuple[float, float]]:
+        """Transmits a message of *size* bytes over the link and returns its (queue time, latency)"""
+        return self.model.transmit(size, owner)
+
+    def resume(self, job: Job) -> Generator[Event, Any, Tuple[float, float]]:
+        """Transmits (the rest of) a job restored from a checkpoint and returns its (queue time, latency)"""
+        return self.model.resume(job)
 
 
 class Link4G(Link):
@@ -79,52 +397,203 @@ class LinkCable(Link):
         super().__init__(bandwidth=1000, latency=5, watt_idle=0, watt_load=5)
 
 
+class Scheduler(ABC):
+    """Defines how a `Node` schedules the execution of operators on its cores.
+
+    Args:
+        env: Simulation environment
+        node: The node this scheduler belongs to
+        trace: Optional `QueueTrace` which records the queue length over time
+    """
+
+    def __init__(self, env: Environment, node: "Node", trace: Optional[QueueTrace] = None):
+        self.env = env
+        self.node = node
+        self.jobs: Dict[Job, None] = {}  # Jobs in order of arrival
+
+    @property
+    @abstractmethod
+    def usage(self) -> float:
+        """Average fraction of busy cores over the simulated time"""
+
+    def process(self, instructions: int, priority: int = 0, owner: Any = None) -> Generator[Event, Any, Tuple[float, float]]:
+        """Executes *instructions* on the node and returns the (queue time, processing time)"""
+        return self.resume(Job(owner, instructions, self.env.now, priority))
+
+    @abstractmethod
+    def resume(self, job: Job) -> Generator[Event, Any, Tuple[float, float]]:
+        """Executes (the rest of) a job and returns its (queue time, processing time)"""
+
+    @abstractmethod
+    def get_state(self) -> Dict[str, Any]:
+        """Returns the accounting state and copies of all jobs in the order in which they have to be resumed"""
+
+    @abstractmethod
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """Restores the accounting state, the jobs are resumed by the simulation"""
+
+
+class FifoScheduler(Scheduler):
+    """Every core executes one operator at a time, waiting executions are served in order of arrival"""
+
+    def __init__(self, env: Environment, node: "Node", trace: Optional[QueueTrace] = None):
+        super().__init__(env, node, trace)
+        self.resource = self._resource(env, node.cores, trace)
+
+    @staticmethod
+    def _resource(env: Environment, cores: int, trace: Optional[QueueTrace]) -> _Monitored:
+        return MonitoredResource(env, capacity=cores, trace=trace)
+
+    @property
+    def usage(self) -> float:
+        return self.resource.usage
+
+    def resume(self, job: Job) -> Generator[Event, Any, Tuple[float, float]]:
+        self.jobs[job] = None
+        with self._request(job.priority) as req:
+            yield req
+            if job.started is None:
+                job.started = self.env.now
+                processing_time = job.work / self.node.ipt
+                job.until = self.env.now + processing_time
+                yield self.env.timeout(processing_time)
+            else:
+                yield self.env.timeout(job.until - self.env.now)
+        del self.jobs[job]
+        return job.started - job.queued, self.env.now - job.started
+
+    def get_state(self) -> Dict[str, Any]:
+        return _resource_state(self.resource, self.jobs)
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.resource.set_state(state["resource"])
+
+    def _request(self, priority: int):
+        return self.resource.request()
+
+
+class PriorityScheduler(FifoScheduler):
+    """Like `FifoScheduler`, but waiting executions are served by the priority of their application (lower values first)"""
+
+    @staticmethod
+    def _resource(env: Environment, cores: int, trace: Optional[QueueTrace]) -> _Monitored:
+        return MonitoredPriorityResource(env, capacity=cores, trace=trace)
+
+    def _request(self, priority: int):
+        return self.resource.request(priority=priority)
+
+
+class ProcessorSharingScheduler(Scheduler):
+    """All executions run concurrently and share the cores equally, each execution uses at most one core.
+
+    The queue time of an execution is the additional processing time caused by sharing the cores.
+    """
+
+    def __init__(self, env: Environment, node: "Node", trace: Optional[QueueTrace] = None):
+        super().__init__(env, node, trace)
+        self.capacity = SharedCapacity(env, rate=node.ipt, servers=node.cores, trace=trace)
+
+    @property
+    def usage(self) -> float:
+        return self.capacity.usage
+
+    def resume(self, job: Job) -> Generator[Event, Any, Tuple[float, float]]:
+        self.jobs[job] = None
+        job.event = self.capacity.process(job.work if job.remaining is None else job.remaining)
+        yield job.event
+        del self.jobs[job]
+        processing_time = job.work / self.node.ipt
+        return max(self.env.now - job.queued - processing_time, 0), processing_time
+
+    def get_state(self) -> Dict[str, Any]:
+        return _capacity_state(self.capacity, self.jobs)
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.capacity.set_state(state["capacity"])
+
+
 class Node:
-    def __init__(self, name: str, ipt: int, ram: int, watt_idle: int, watt_load: int):
+    """Compute node of the network.
+
+    Args:
+        name: Node name
+        ipt: Instructions per time unit of a single core
+        ram: Memory in MB
+        watt_idle: Power consumption when idle
+        watt_load: Additional power consumption under full load
+        cores: Number of cores which execute operators in parallel
+        scheduler: Scheduling discipline of the cores
+    """
+
+    def __init__(
+        self, name: str, ipt: int, ram: int, watt_idle: int, watt_load: int, cores: int = 1, scheduler: Type[Scheduler] = FifoScheduler
+    ):
         self.name = name
         self.ipt = ipt  # TODO
         self.ram = ram  # MB
         self.watt_idle = watt_idle
         self.watt_load = watt_load
+        self.cores = cores
+        self.scheduler = scheduler
 
         self.env = None
-        self._resource = None
-
-        self._time_under_use = 0
+        self._scheduler = None
 
     def __str__(self):
         return f"{self.__class__.__name__}({self.name})"
 
     @property
     def usage(self) -> float:
-        return self._resource.usage
+        return self._scheduler.usage
 
     @property
     def energy_consumption(self):
         return self.watt_idle + self.watt_load * self.usage
 
-    def set_env(self, env: Environment):
+    def set_env(self, env: Environment, queue_trace: Optional[Callable[[], QueueTrace]] = None):
         self.env = env
-        self._resource = MonitoredResource(env)
+        self._scheduler = self.scheduler(env, self, trace=queue_trace() if queue_trace else None)
 
-    @contextmanager
-    def request(self):
-        with self._resource.request() as req:
-            start = self.env.now
-            yield req
-            self._time_under_use += self.env.now - start
+    def process(self, instructions: int, priority: int = 0, owner: Any = None) -> Generator[Event, Any, Tuple[float, float]]:
+        """Executes *instructions* on the node and returns the (queue time, processing time)"""
+        return self._scheduler.process(instructions, priority, owner)
+
+    def resume(self, job: Job) -> Generator[Event, Any, Tuple[float, float]]:
+        """Executes (the rest of) a job restored from a checkpoint and returns its (queue time, processing time)"""
+        return self._scheduler.resume(job)
+
+    def get_state(self) -> Dict[str, Any]:
+        return self._scheduler.get_state()
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self._scheduler.set_state(state)
+
+
+def _resource_state(resource: _Monitored, jobs: Dict[Job, None]) -> Dict[str, Any]:
+    """State of a link model or scheduler based on a simpy resource: Jobs in service are resumed before waiting jobs"""
+    ordered = sorted(jobs, key=lambda job: job.started is None)  # Stable, waiting jobs keep their order of arrival
+    return {"resource": resource.get_state(), "jobs": [job.copy() for job in ordered]}
+
+
+def _capacity_state(capacity: SharedCapacity, jobs: Dict[Job, None]) -> Dict[str, Any]:
+    """State of a link model or scheduler based on a `SharedCapacity`: Shared jobs are resumed in order of completion"""
+    remaining = capacity.remaining_work()
+    order = {event: i for i, event in enumerate(remaining)}
+    shared = sorted((job for job in jobs if job.event is not None), key=lambda job: order[job.event])
+    timed = [job.copy() for job in jobs if job.event is None]
+    return {"capacity": capacity.get_state(), "jobs": timed + [job.copy(remaining=remaining[job.event]) for job in shared]}
 
 
 class Sensor(Node):
-    def __init__(self, name: str):
-        super().__init__(name, ipt=10, ram=2000, watt_idle=3, watt_load=12)
+    def __init__(self, name: str, **kwargs):
+        super().__init__(name, ipt=10, ram=2000, watt_idle=3, watt_load=12, **kwargs)
 
 
 class Fog(Node):
-    def __init__(self, name: str):
-        super().__init__(name, ipt=20, ram=4000, watt_idle=5, watt_load=20)
+    def __init__(self, name: str, **kwargs):
+        super().__init__(name, ipt=20, ram=4000, watt_idle=5, watt_load=20, **kwargs)
 
 
 class Cloud(Node):
-    def __init__(self, name: str):
-        super().__init__(name, ipt=200, ram=20000, watt_idle=10, watt_load=150)
\ No newline at end of file
+    def __init__(self, name: str, **kwargs):
+        super().__init__(name, ipt=200, ram=20000, watt_idle=10, watt_load=150, **kwargs)
\ No newline at end of file
@@ -1,79 +1,244 @@
 import logging
 import random
 from abc import ABC, abstractmethod
-from typing import List, Any
+from itertools import islice, takewhile, accumulate
+from typing import List, Any, Dict, Tuple, Iterable, Iterator, Optional, Callable
 
 import networkx as nx
+from networkx.utils import pairwise
+from simpy import Environment
 
-from pyfogsim.application import Message
+from pyfogsim.application import MessageInstance, Application
 
 logger = logging.getLogger(__name__)
 
 
 class Selection(ABC):
-    """Computes the message path among topology edges"""
+    """Computes the message path among topology edges
+
+    Attributes:
+        direct_neighbours: If True, the selection always sends messages between neighbouring nodes over their direct link,
+            so the simulation can skip `get_path` for them.
+    """
+
+    direct_neighbours = False
 
     @abstractmethod
-    def get_path(self, G: nx.Graph, message: Message, src_node: Any, dst_node: Any) -> List[Any]:
+    def get_path(self, G: nx.Graph, message: MessageInstance, src_node: Any, dst_node: Any) -> List[Any]:
         """Computes the message path among topology edges"""
 
+    def update(self, G: nx.Graph, apps: List[Application]) -> None:
+        """Invoked whenever the topology (through the `Simulation`) or the placement of modules changed. Selections with a
+        `RoutingTable` must rebuild or clear it here."""
+
+    def set_env(self, env: Environment) -> None:
+        """Invoked by the simulation, gives access to the simulation time"""
+        self.env = env
+
+
+class RoutingTable:
+    """Maps (src, dst) node pairs to precomputed paths (or any other routing information computed by *compute_path*).
+
+    Lookups do not check the network for changes (counting the edges of a networkx graph is linear in its size), the owner of
+    the table has to `build()` or `clear()` it in `Selection.update()`. The simulation invokes it after every placement and
+    every topology change made through `Simulation.add_link()`, `remove_link()` or `remove_node()`.
+
+    Args:
+        compute_path: Function that computes the path between two nodes of a network
+    """
+
+    def __init__(self, compute_path):
+        self.compute_path = compute_path
+        self.paths: Dict[Tuple[Any, Any], List[Any]] = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def get(self, G: nx.Graph, src_node: Any, dst_node: Any) -> List[Any]:
+        try:
+            return self.paths[src_node, dst_node]
+        except KeyError:
+            path = self.paths[src_node, dst_node] = self.compute_path(G, src_node, dst_node)
+            return path
+
+    def build(self, G: nx.Graph, pairs: Iterable[Tuple[Any, Any]]) -> None:
+        """Clears the table and computes the paths for all given (src, dst) pairs."""
+        self.clear()
+        for src_node, dst_node in pairs:
+            if (src_node, dst_node) not in self.paths:
+                self.paths[src_node, dst_node] = self.compute_path(G, src_node, dst_node)
+        logger.debug(f"Built routing table with {len(self.paths)} paths.")
+
+    def clear(self) -> None:
+        self.paths = {}
+
+
+def app_node_pairs(apps: List[Application]) -> Iterator[Tuple[Any, Any]]:
+    """Yields all (src, dst) node pairs between which the deployed applications send messages.
+
+    Modules which are not yet placed are skipped.
+    """
+    for app in apps:
+        nodes = [app.source.node] + [operator.node for operator in app.operators] + [app.sink.node]
+        for src_node, dst_node in pairwise(nodes):
+            if src_node is not None and dst_node is not None:
+                yield src_node, dst_node
+
 
 class RandomPath(Selection):
-    def get_path(self, G: nx.Graph, message: Message, src_node: Any, dst_node: Any) -> List[Any]:
-        return random.choice(list(nx.all_simple_paths(G, source=src_node, target=dst_node)))
+    """Sends every message along a random path out of the *k* shortest loop-free paths between two nodes.
+
+    Candidate paths are computed once per (src, dst) pair and cached until the next `update()`.
+
+    Args:
+        k: Maximum number of candidate paths per (src, dst) pair
+        max_hops: If set, candidate paths with more hops are discarded
+        weight: Maps a candidate path to its relative probability of being chosen, e.g. `lambda path: 1 / len(path)`.
+            All candidates are equally likely by default.
+    """
+
+    def __init__(self, k: int = 10, max_hops: Optional[int] = None, weight: Optional[Callable[[List[Any]], float]] = None):
+        self.k = k
+        self.max_hops = max_hops
+        self.weight = weight
+        self.candidates = RoutingTable(self._candidate_paths)
+
+    def get_path(self, G: nx.Graph, message: MessageInstance, src_node: Any, dst_node: Any) -> List[Any]:
+        paths, cum_weights = self.candidates.get(G, src_node, dst_node)
+        return random.choices(paths, cum_weights=cum_weights)[0]
+
+    def update(self, G: nx.Graph, apps: List[Application]) -> None:
+        self.candidates.build(G, app_node_pairs(apps))
+
+    def _candidate_paths(self, G: nx.Graph, src_node: Any, dst_node: Any) -> Tuple[List[List[Any]], Optional[List[float]]]:
+        paths = nx.shortest_simple_paths(G, source=src_node, target=dst_node)
+        if self.max_hops is not None:
+            paths = takewhile(lambda path: len(path) - 1 <= self.max_hops, paths)
+        paths = list(islice(paths, self.k))
+        if not paths:
+            raise nx.NetworkXNoPath(f"No path with at most {self.max_hops} hops between {src_node} and {dst_node}.")
+        cum_weights = list(accumulate(self.weight(path) for path in paths)) if self.weight is not None else None
+        return paths, cum_weights
 
 
 class ShortestPath(Selection):
-    def get_path(self, G: nx.Graph, message: Message, src_node: Any, dst_node: Any) -> List[Any]:
-        return nx.shortest_path(G, source=src_node, target=dst_node)
+    """Sends messages along the shortest path (in number of hops) between two nodes.
 
+    Args:
+        routing_table: If True, paths are looked up in a routing table which is built for all (src, dst) pairs used by the deployed
+            applications and rebuilt whenever the placement or the topology (through the `Simulation`) changes.
+    """
 
-class DeviceSpeedAwareRouting(Selection):  # TODO from YAFS, partially adapted
-    def __init__(self):
-        self.cache = {}
-        self.cache_size = -1  # Number of nodes in the cache. If the number changes, the cache is getting cleared.
+    direct_neighbours = True
 
-    @staticmethod
-    def _best_dst_process(src_node, dst_nodes, G, message):
-        tuples = [(nx.shortest_path(G, src_node, n), n) for n in dst_nodes]
-        return min(tuples, key=lambda path, _: len(path))
+    def __init__(self, routing_table: bool = False):
+        self.routing_table = RoutingTable(self._shortest_path) if routing_table else None
+
+    def get_path(self, G: nx.Graph, message: MessageInstance, src_node: Any, dst_node: Any) -> List[Any]:
+        if self.routing_table is not None:
+            return self.routing_table.get(G, src_node, dst_node)
+        return self._shortest_path(G, src_node, dst_node)
+
+    def update(self, G: nx.Graph, apps: List[Application]) -> None:
+        if self.routing_table is not None:
+            self.routing_table.build(G, app_node_pairs(apps))
 
     @staticmethod
-    def _DSAR(src_node, dst_nodes, G, message):
-        def _speed(path, _):
-            network_time = 0
-            for node in range(len(path) - 1):
-                edge = G.edges[(path[node], path[node + 1])]
-                network_time += edge[Topology.LINK_PR] + (message.bytes / edge[Topology.LINK_BW])
-            dst_node = G.nodes[path[-1]]
-            processing_time = message.instructions / float(dst_node["ipt"])
-            return network_time + processing_time
-        tuples = [(nx.shortest_path(G, src_node, n), n) for n in dst_nodes]
-        return min(tuples, key=_speed)
-
-    def get_path(self, G, message, src_node, dst_nodes):
-        if self.cache_size != len(G):
-            self.cache_size = len(G)
-            self.cache = {}
-
-        if (src_node, dst_nodes) not in list(self.cache.keys()):
-            self.cache[src_node, dst_nodes] = self._DSAR(src_node, dst_nodes, G, message)
-            self.cache[src_node, dst_nodes] = self._best_dst_process(src_node, dst_nodes, G, message)
-
-        path, des = self.cache[src_node, dst_nodes]
-        return [path], [des]
-
-    def get_path_from_failure(self, sim, message, link, alloc_DES, alloc_module, ctime):
-        index = message.path.index(link[0])
-        if index == len(message.path):
-            # The node who serves ... not possible case  # TODO Rework
-            return [], []
-        else:
-            node_src = message.path[index]  # In this point to the other entity the system fail
-            path, des = self.get_path(sim, message.app_name, message, node_src, alloc_DES, alloc_module)
-            if len(path[0]) > 0:
-                conc_path = message.path[0 : message.path.index(path[0][0])] + path[0]
-                message.next_dst = node_src  # TODO Not sure whether Selections should change messages...
-                return [conc_path], des
-            else:
-                return [], []
+    def _shortest_path(G: nx.Graph, src_node: Any, dst_node: Any) -> List[Any]:
+        return nx.shortest_path(G, source=src_node, target=dst_node)
+
+
+class DeviceSpeedAwareRouting(Selection):
+    """Sends messages along the path with the lowest expected transfer time.
+
+    The transfer time over a link is its latency plus the time to serialize the message onto it (size / bandwidth).
+    Paths are memoized per (src, dst, size class), where messages whose sizes round up to the same power of two share a class,
+    until the next `update()`.
+    """
+
+    def __init__(self):
+        self.routing_table = RoutingTable(lambda G, src_node, dst_node: {})
+
+    def update(self, G: nx.Graph, apps: List[Application]) -> None:
+        self.routing_table.clear()
+
+    def get_path(self, G: nx.Graph, message: MessageInstance, src_node: Any, dst_node: Any) -> List[Any]:
+        path, _ = self._fastest_path(G, message.size, src_node, dst_node)
+        return path
+
+    def expected_time(self, G: nx.Graph, message: MessageInstance, src_node: Any, dst_node: Any) -> float:
+        """Expected time to transfer the message to *dst_node* and process it there, assuming no congestion"""
+        _, transfer_time = self._fastest_path(G, message.size, src_node, dst_node)
+        return transfer_time + message.instructions / dst_node.ipt
+
+    def _fastest_path(self, G: nx.Graph, size: int, src_node: Any, dst_node: Any) -> Tuple[List[Any], float]:
+        paths = self.routing_table.get(G, src_node, dst_node)
+        size_class = int(size).bit_length()
+        try:
+            return paths[size_class]
+        except KeyError:
+            pass
+        class_size = (1 << size_class) - 1  # Largest size in this class
+
+        def transfer_time(u, v, data):
+            return data["link"].latency + class_size / data["link"].bandwidth
+
+        path = nx.shortest_path(G, source=src_node, target=dst_node, weight=transfer_time)
+        result = paths[size_class] = path, sum(transfer_time(u, v, G.edges[u, v]) for u, v in pairwise(path))
+        return result
+
+
+class CongestionAwareRouting(Selection):
+    """Sends messages along the path with the lowest expected transfer time, taking the queues of links into account.
+
+    Every queued message is expected to occupy a link for its latency plus the serialization time of the current message,
+    so the cost of a link is `(1 + queue depth) * (latency + size / bandwidth)`. To keep routing cheap, queue depths are only
+    read every *update_interval* time units and smoothed by an exponentially weighted moving average. Paths are memoized
+    per (src, dst, size class) until the smoothed depth of any link changes by more than *tolerance* or `update()` is invoked.
+
+    Args:
+        update_interval: Simulated time between two updates of the queue depths
+        smoothing: Weight of the current queue length in the moving average, 1 disables smoothing
+        tolerance: Minimum change of a smoothed queue depth which invalidates the memoized paths
+    """
+
+    def __init__(self, update_interval: float = 10, smoothing: float = 0.5, tolerance: float = 0.5):
+        self.update_interval = update_interval
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.env = None
+        self.queue_depth: Dict[Any, float] = {}  # Smoothed queue depth per link
+        self.routing_table = RoutingTable(lambda G, src_node, dst_node: {})
+        self._next_update = 0
+
+    def update(self, G: nx.Graph, apps: List[Application]) -> None:
+        self.routing_table.clear()
+
+    def get_path(self, G: nx.Graph, message: MessageInstance, src_node: Any, dst_node: Any) -> List[Any]:
+        if self.env is not None and self.env.now >= self._next_update:
+            self._update_queue_depths(G)
+            self._next_update = self.env.now + self.update_interval
+        paths = self.routing_table.get(G, src_node, dst_node)
+        size_class = int(message.size).bit_length()
+        try:
+            return paths[size_class]
+        except KeyError:
+            pass
+        class_size = (1 << size_class) - 1  # Largest size in this class
+
+        def cost(u, v, data):
+            link = data["link"]
+            return (1 + self.queue_depth.get(link, 0)) * (link.latency + class_size / link.bandwidth)
+
+        path = paths[size_class] = nx.shortest_path(G, source=src_node, target=dst_node, weight=cost)
+        return path
+
+    def _update_queue_depths(self, G: nx.Graph) -> None:
+        changed = False
+        for _, _, link in G.edges(data="link"):
+            old = self.queue_depth.get(link, 0)
+            new = self.smoothing * link.queue_length + (1 - self.smoothing) * old
+            self.queue_depth[link] = new
+            changed = changed or abs(new - old) > self.tolerance
+        if changed:
+            self.routing_table.clear()
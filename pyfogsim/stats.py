@@ -1,75 +1,521 @@
 import csv
+import glob
 import logging
 import os
-from typing import List, Dict
+from typing import List, Dict, Any, Tuple, Iterator, Optional, Callable
 
 import numpy as np
 import pandas as pd
 
-from pyfogsim.application import Application, Module, Message
+from pyfogsim.application import Application, Module, MessageInstance
 
 logger = logging.getLogger(__name__)
 
 
+MESSAGE_LOG_COLUMNS = (
+    "app_name",
+    "module_type",
+    "module_name",
+    "node",
+    "message",
+    "instructions",
+    "size",
+    "created",
+    "network_queue",
+    "network_latency",
+    "operator_queue",
+    "operator_processing",
+    "count",
+    "batch_wait",
+    "origin",
+)
+
+
+def _message_record(app: Application, module: Module, message: MessageInstance) -> Tuple:
+    """Returns the values of a message log entry in the order of `MESSAGE_LOG_COLUMNS`"""
+    return (
+        app.name,
+        module.__class__.__name__,
+        module.name,
+        module.node,
+        message.name,
+        message.instructions,
+        message.size,
+        message.created,
+        message.network_queue,
+        message.network_latency,
+        message.operator_queue,
+        message.operator_processing,
+        message.count,
+        message.batch_wait,
+        message.origin,
+    )
+
+
 class EventLog:
 
     MESSAGE_LOG_FILE = "message_log.csv"
+    DTYPES = {
+        "instructions": np.int64,
+        "size": np.int64,
+        "created": np.float64,
+        "network_queue": np.float64,
+        "network_latency": np.float64,
+        "operator_queue": np.float64,
+        "operator_processing": np.float64,
+        "count": np.int64,
+        "batch_wait": np.float64,
+        "origin": np.float64,
+    }
+    DEFAULTS = {"count": 1, "batch_wait": 0, "origin": np.nan}  # Values of columns missing in logs of older versions
 
     def __init__(self):
         self.message_log = []
 
+    def __len__(self):
+        return len(self.message_log)
+
     def load(self, path: str = "results") -> None:
-        self.message_log = _load_csv(path, self.MESSAGE_LOG_FILE)
+        df = pd.concat(self.load_chunks(path), ignore_index=True).astype(self.DTYPES)
+        self.message_log = df.astype(object).where(df.notna(), None).to_dict("records")
 
     def write(self, path: str = "results") -> None:
         _write_csv(path, self.MESSAGE_LOG_FILE, self.message_log)
 
-    def append(self, app: Application, module: Module, message: Message) -> None:
-        self.message_log.append({
-            "app_name": app.name,
-            "module_type": module.__class__.__name__,
-            "module_name": module.name,
-            "node": module.node,
-            "message": message.name,
-            "instructions": message.instructions,
-            "size": message.size,
-            "created": message.created,
-            "network_queue": message.network_queue,
-            "network_latency": message.network_latency,
-            "operator_queue": message.operator_queue,
-            "operator_processing": message.operator_processing,
-        })
-
-
-# TODO Missing documentation
+    def append(self, app: Application, module: Module, message: MessageInstance) -> None:
+        self.message_log.append(dict(zip(MESSAGE_LOG_COLUMNS, _message_record(app, module, message))))
+
+    def flush(self) -> None:
+        """Invoked at the end of every simulation run, event logs which write to disk while simulating persist pending records here."""
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.message_log, columns=MESSAGE_LOG_COLUMNS).astype(self.DTYPES)
+
+    def get_state(self, encode_node: Callable[[Any], Any]) -> Dict[str, Any]:
+        """Returns the log for a checkpoint, nodes are replaced by *encode_node* so the state can be pickled"""
+        return {"message_log": [dict(record, node=encode_node(record["node"])) for record in self.message_log]}
+
+    def set_state(self, state: Dict[str, Any], decode_node: Callable[[Any], Any]) -> None:
+        self.message_log = [dict(record, node=decode_node(record["node"])) for record in state["message_log"]]
+
+    @classmethod
+    def load_chunks(cls, path: str = "results", chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Reads a message log in chunks of at most *chunk_size* rows.
+
+        Supports the CSV file written by `write()` as well as the Parquet and Arrow IPC batch files written by a `StreamingEventLog`.
+        If *chunk_size* is not set, the log is read in the batches it was written in (the whole file for CSV).
+        Columns missing in older logs are filled with their `DEFAULTS`.
+        """
+        for chunk in cls._read_chunks(path, chunk_size):
+            for column, default in cls.DEFAULTS.items():
+                if column not in chunk.columns:
+                    chunk[column] = default
+            yield chunk
+
+    @classmethod
+    def _read_chunks(cls, path: str, chunk_size: Optional[int]) -> Iterator[pd.DataFrame]:
+        for extension in ("parquet", "arrow"):
+            files = sorted(glob.glob(os.path.join(path, f"{_stem(cls.MESSAGE_LOG_FILE)}.*.{extension}")))
+            if files:
+                yield from _read_batches(files, extension, chunk_size)
+                return
+        csv_path = os.path.join(path, cls.MESSAGE_LOG_FILE)
+        if chunk_size is None:
+            yield pd.read_csv(csv_path)
+        else:
+            yield from pd.read_csv(csv_path, chunksize=chunk_size)
+
+
+class ColumnarEventLog(EventLog):
+    """Event log which stores every column in a growable, typed NumPy array.
+
+    App, module, node and message names are interned to integer codes and become categoricals in `to_dataframe()`,
+    numeric columns are passed to pandas without copying. The list-of-dicts `message_log` is still available as a (slow) view.
+    Appended records are buffered as tuples and written to the arrays in blocks of `BLOCK_SIZE` records.
+
+    Args:
+        capacity: Initial number of rows, the arrays double in size whenever they are full
+    """
+
+    CATEGORICAL_COLUMNS = ("app_name", "module_type", "module_name", "node", "message")
+    BLOCK_SIZE = 512
+
+    def __init__(self, capacity: int = 1024):
+        self._length = 0  # Number of records in the arrays
+        self._rows: List[Tuple] = []  # Records not yet written to the arrays
+        self._categories: Dict[str, List[Any]] = {}
+        self._codes: Dict[str, Dict[Any, int]] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._allocate(capacity)
+
+    def __len__(self):
+        return self._length + len(self._rows)
+
+    @property
+    def message_log(self) -> List[Dict]:
+        return self.to_dataframe().astype(object).where(lambda df: df.notna(), None).to_dict("records")
+
+    def load(self, path: str = "results") -> None:
+        self._from_dataframe(pd.concat(self.load_chunks(path), ignore_index=True))
+
+    def write(self, path: str = "results") -> None:
+        if len(self) == 0:
+            logger.warning("No stats to write: Empty content.")
+            return
+        os.makedirs(path, exist_ok=True)
+        self._to_plain_dataframe().to_csv(os.path.join(path, self.MESSAGE_LOG_FILE), index=False)
+
+    def append(self, app: Application, module: Module, message: MessageInstance) -> None:
+        self._rows.append(_message_record(app, module, message))
+        if len(self._rows) >= self.BLOCK_SIZE:
+            self._commit()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        self._commit()
+        n = self._length
+        data = {}
+        for column in MESSAGE_LOG_COLUMNS:
+            if column in self._codes:
+                data[column] = pd.Categorical.from_codes(self._columns[column][:n], categories=pd.Index(self._categories[column], dtype=object))
+            else:
+                data[column] = self._columns[column][:n]
+        return pd.DataFrame(data, columns=MESSAGE_LOG_COLUMNS, copy=False)
+
+    def get_state(self, encode_node: Callable[[Any], Any]) -> Dict[str, Any]:
+        self._commit()
+        n = self._length
+        categories = dict(self._categories, node=[encode_node(node) for node in self._categories["node"]])
+        return {"columns": {column: array[:n].copy() for column, array in self._columns.items()}, "categories": categories}
+
+    def set_state(self, state: Dict[str, Any], decode_node: Callable[[Any], Any]) -> None:
+        self._columns = {column: array.copy() for column, array in state["columns"].items()}
+        self._length = len(self._columns["size"])
+        self._rows = []
+        self._categories = dict(state["categories"], node=[decode_node(node) for node in state["categories"]["node"]])
+        self._codes = {column: {value: code for code, value in enumerate(values)} for column, values in self._categories.items()}
+
+    def _to_plain_dataframe(self) -> pd.DataFrame:
+        """Returns the log with all names (and nodes) as strings, as they are stored on disk"""
+        self._commit()
+        n = self._length
+        data = {}
+        for column in MESSAGE_LOG_COLUMNS:
+            if column in self._codes:
+                categories = np.array([str(value) for value in self._categories[column]] or [""], dtype=object)
+                data[column] = categories[self._columns[column][:n]]
+            else:
+                data[column] = self._columns[column][:n]
+        return pd.DataFrame(data, columns=MESSAGE_LOG_COLUMNS)
+
+    def _commit(self) -> None:
+        """Writes the buffered records to the arrays"""
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        start, end = self._length, self._length + len(rows)
+        while end > len(self._columns["size"]):
+            self._grow()
+        for column, values in zip(MESSAGE_LOG_COLUMNS, zip(*rows)):
+            if column in self._codes:
+                codes = self._codes[column]
+                for value in dict.fromkeys(values):  # Distinct values in order of appearance
+                    if value not in codes:
+                        self._intern(column, value)
+                values = list(map(codes.__getitem__, values))
+            self._columns[column][start:end] = values  # None becomes NaN in float columns
+        self._length = end
+
+    def _intern(self, column: str, value: Any) -> int:
+        codes = self._codes[column]
+        try:
+            return codes[value]
+        except KeyError:
+            code = codes[value] = len(codes)
+            self._categories[column].append(value)
+            return code
+
+    def _allocate(self, capacity: int) -> None:
+        for column in MESSAGE_LOG_COLUMNS:
+            if column in self.CATEGORICAL_COLUMNS:
+                self._columns[column] = np.empty(capacity, dtype=np.int32)
+                self._codes[column] = {}
+                self._categories[column] = []
+            else:
+                self._columns[column] = np.empty(capacity, dtype=self.DTYPES[column])
+
+    def _grow(self) -> None:
+        for column, array in self._columns.items():
+            grown = np.empty(max(2 * len(array), 1), dtype=array.dtype)
+            grown[:len(array)] = array
+            self._columns[column] = grown
+
+    def _from_dataframe(self, df: pd.DataFrame) -> None:
+        self._length = len(df)
+        self._rows = []
+        for column in MESSAGE_LOG_COLUMNS:
+            if column in self.CATEGORICAL_COLUMNS:
+                codes, uniques = pd.factorize(df[column])
+                self._columns[column] = codes.astype(np.int32)
+                self._categories[column] = list(uniques)
+                self._codes[column] = {value: code for code, value in enumerate(uniques)}
+            else:
+                self._columns[column] = df[column].to_numpy(dtype=self.DTYPES[column], copy=True)
+
+
+class StreamingEventLog(ColumnarEventLog):
+    """Columnar event log which flushes its records to disk in fixed-size batches while the simulation is running.
+
+    Memory usage is bounded by *batch_size* records, independent of the simulated horizon. Batches are appended to a single
+    CSV file or, for the binary formats, written to one numbered file each. Use `EventLog.load_chunks()` to read the results.
+
+    Checkpoints only store the offset up to which the log was flushed. When resuming, records written after the checkpoint
+    are truncated. Reading `message_log` or `to_dataframe()` flushes the pending records and reads the whole log back from disk.
+
+    Args:
+        path: Directory to write the message log to
+        batch_size: Number of records kept in memory before they are flushed to disk
+        file_format: One of "csv", "parquet" or "arrow" (Arrow IPC). The binary formats require `pyarrow`.
+        overwrite: If True, an existing message log in *path* is removed. Pass False to resume a simulation from a checkpoint.
+    """
+
+    FORMATS = ("csv", "parquet", "arrow")
+
+    def __init__(self, path: str = "results", batch_size: int = 100_000, file_format: str = "csv", overwrite: bool = True):
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unknown file format '{file_format}', must be one of {self.FORMATS}.")
+        if file_format != "csv":
+            _import_pyarrow()
+        super().__init__(capacity=batch_size)
+        self.path = path
+        self.batch_size = batch_size
+        self.file_format = file_format
+        self.flushed = 0  # Number of records written to disk
+        self._batches = 0
+        os.makedirs(path, exist_ok=True)
+        if overwrite:
+            self._remove_existing_files()
+
+    def __len__(self):
+        return self.flushed + super().__len__()
+
+    def append(self, app: Application, module: Module, message: MessageInstance) -> None:
+        super().append(app, module, message)
+        if self._length + len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self._commit()
+        if self._length == 0:
+            return
+        df = self._to_plain_dataframe()
+        if self.file_format == "csv":
+            file_path = os.path.join(self.path, self.MESSAGE_LOG_FILE)
+            df.to_csv(file_path, mode="a", header=(self.flushed == 0), index=False)
+        else:
+            file_path = os.path.join(self.path, f"{_stem(self.MESSAGE_LOG_FILE)}.{self._batches:06d}.{self.file_format}")
+            _write_arrow(df, file_path, self.file_format)
+        logger.debug(f"Flushed {self._length} records to '{file_path}'.")
+        self.flushed += self._length
+        self._batches += 1
+        self._length = 0
+
+    def get_state(self, encode_node: Callable[[Any], Any]) -> Dict[str, Any]:
+        """Flushes all pending records and returns the offset of the log on disk"""
+        self.flush()
+        csv_path = os.path.join(self.path, self.MESSAGE_LOG_FILE)
+        csv_bytes = os.path.getsize(csv_path) if self.file_format == "csv" and os.path.exists(csv_path) else 0
+        return {"flushed": self.flushed, "batches": self._batches, "csv_bytes": csv_bytes}
+
+    def set_state(self, state: Dict[str, Any], decode_node: Callable[[Any], Any]) -> None:
+        """Truncates the log on disk to the checkpointed offset"""
+        self._length = 0
+        self._rows = []
+        self.flushed = state["flushed"]
+        self._batches = state["batches"]
+        stem = _stem(self.MESSAGE_LOG_FILE)
+        if self.file_format == "csv":
+            csv_path = os.path.join(self.path, self.MESSAGE_LOG_FILE)
+            size = os.path.getsize(csv_path) if os.path.exists(csv_path) else 0
+            if size < state["csv_bytes"]:
+                raise ValueError(f"Message log '{csv_path}' is shorter than in the checkpoint.")
+            if size > 0:
+                os.truncate(csv_path, state["csv_bytes"])
+        else:
+            for file_path in sorted(glob.glob(os.path.join(self.path, f"{stem}.*.{self.file_format}"))):
+                if int(os.path.basename(file_path).split(".")[-2]) >= self._batches:
+                    logger.info(f"Removing message log batch '{file_path}' written after the checkpoint.")
+                    os.remove(file_path)
+
+    def write(self, path: Optional[str] = None) -> None:
+        """Flushes all pending records. The log is always written to the directory given on construction."""
+        if path is not None and os.path.abspath(path) != os.path.abspath(self.path):
+            logger.warning(f"StreamingEventLog writes to '{self.path}', ignoring path '{path}'.")
+        self.flush()
+
+    def load(self, path: str = "results") -> None:
+        """Continues the message log in *path*, records appended afterwards are written after the loaded ones.
+
+        The log is read in chunks of *batch_size* records. A log in another directory is copied to this log's directory,
+        replacing its content.
+        """
+        self._length = 0
+        self._rows = []
+        if os.path.abspath(path) == os.path.abspath(self.path):
+            self.flushed = sum(len(chunk) for chunk in self.load_chunks(path, self.batch_size))
+            if self.file_format == "csv":
+                self._batches = int(self.flushed > 0)
+            else:
+                self._batches = len(glob.glob(os.path.join(self.path, f"{_stem(self.MESSAGE_LOG_FILE)}.*.{self.file_format}")))
+            return
+        self._remove_existing_files()
+        self.flushed = self._batches = 0
+        for chunk in self.load_chunks(path, self.batch_size):
+            self._from_dataframe(chunk)
+            self.flush()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Reads the whole message log from disk, this is as expensive as it sounds."""
+        self.flush()
+        if self.flushed == 0:
+            return super().to_dataframe()
+        return pd.concat(self.load_chunks(self.path), ignore_index=True)
+
+    def _remove_existing_files(self):
+        stem = _stem(self.MESSAGE_LOG_FILE)
+        for file_path in [os.path.join(self.path, self.MESSAGE_LOG_FILE)] + glob.glob(os.path.join(self.path, f"{stem}.*.*")):
+            if os.path.exists(file_path):
+                logger.warning(f"Removing existing message log '{file_path}'.")
+                os.remove(file_path)
+
+
 class Stats:
+    """Statistics over the message log of a simulation.
+
+    All statistics are computed with vectorized pandas/NumPy operations. Derived columns are added to `messages` on first use
+    and reused by all later queries:
+
+    - *time*: Simulation time when the message was logged, i.e. arrived at its module (and was processed by it)
+    - *latency*: Time from creating the logical messages until they were logged, including batching, network and operator times
+    - *end_to_end_latency*: Only for messages arriving at a sink, time since the request was created at its source
+
+    Latencies of a batch are averages over its logical messages. Percentiles and `message_stats` weight every batch by its
+    *count*, the means of the time components in `summary` and `print_report` are averages over the logged batches.
+    """
+
+    TIMES = ["network_queue", "network_latency", "operator_queue", "operator_processing"]
+    PERCENTILES = (0.5, 0.95, 0.99)
 
     def __init__(self, event_log: EventLog):
-        self.messages = pd.DataFrame(event_log.message_log)
+        self.messages = event_log.to_dataframe()
 
     def count_messages(self):
+        """Number of logical messages, a batch of messages counts as its number of messages"""
         if self.messages.empty:
             return 0
-        return len(self.messages)
+        return self.messages["count"].sum()
 
     def bytes_transmitted(self):
         if self.messages.empty:
             return 0
         return self.messages["size"].sum()
 
-    def utilization(self, id_entity, total_time, from_time=0.0):  # TODO
-        if "time_service" not in self.messages.columns:  # cached
-            self.messages["time_service"] = self.messages.time_out - self.messages.time_in
-        values = self.messages.groupby("DES.dst").time_service.agg("sum")
-        return values[id_entity] / total_time
+    def column(self, name: str) -> pd.Series:
+        """Returns a column of `messages`, derived columns are computed on first access"""
+        if name not in self.messages.columns:  # cached
+            m = self.messages
+            if name == "time":
+                m["time"] = m["created"] + m["network_queue"] + m["network_latency"] + m["operator_queue"].fillna(0) + m["operator_processing"].fillna(0)
+            elif name == "latency":
+                m["latency"] = self.column("time") - m["created"] + m["batch_wait"]
+            elif name == "end_to_end_latency":
+                m["end_to_end_latency"] = (self.column("time") - m["origin"]).where(m["module_type"] == "Sink")
+            else:
+                raise KeyError(name)
+        return self.messages[name]
+
+    def latency_percentiles(self, by: str = "app_name", latency: str = "end_to_end_latency", percentiles=PERCENTILES) -> pd.DataFrame:
+        """Returns count, mean, percentiles and maximum of a latency column per group.
+
+        Count, mean and percentiles are over logical messages, i.e. every batch is weighted by its *count*.
+
+        Args:
+            by: Column to group by, e.g. "app_name", "node", "message" or "module_name"
+            latency: "end_to_end_latency" (only messages arriving at sinks) or "latency" (all messages)
+            percentiles: Percentiles between 0 and 1
+        """
+        percentile_columns = [f"p{q * 100:g}" for q in percentiles]
+        values = self.column(latency).astype(float).dropna()
+        if values.empty:
+            return pd.DataFrame(columns=["count", "mean", *percentile_columns, "max"])
+        counts = self.messages.loc[values.index, "count"]
+        df = pd.DataFrame({"value": values, "count": counts, "weighted": values * counts})
+        # Nodes are not orderable, so groups keep the order in which they appear
+        grouped = df.groupby(self.messages.loc[values.index, by], observed=True, sort=False)
+        result = grouped[["count", "weighted"]].sum()
+        result["mean"] = result.pop("weighted") / result["count"]
+        quantiles = pd.DataFrame(
+            [self._quantiles(group, percentiles) for _, group in grouped["value"]], index=result.index, columns=percentile_columns
+        )
+        return result.join(quantiles).join(grouped["value"].max().rename("max"))
+
+    def _quantiles(self, values: pd.Series, percentiles) -> np.ndarray:
+        """Quantiles of the logical messages of *values*, with linear interpolation like `pandas.Series.quantile`.
+
+        Equals the quantiles of the values repeated *count* times, without materializing them.
+        """
+        if values.empty:
+            return np.full(len(percentiles), np.nan)
+        order = np.argsort(values.to_numpy(), kind="stable")
+        sorted_values = values.to_numpy()[order]
+        ends = np.cumsum(self.messages.loc[values.index, "count"].to_numpy()[order])  # Exclusive end position of every value
+        position = np.asarray(percentiles) * (ends[-1] - 1)
+        lower = np.floor(position)
+        below = sorted_values[np.searchsorted(ends, lower, side="right")]
+        above = sorted_values[np.searchsorted(ends, np.minimum(lower + 1, ends[-1] - 1), side="right")]
+        return below + (position - lower) * (above - below)
+
+    def throughput(self, window: float, module_type: Optional[str] = "Sink") -> pd.Series:
+        """Number of logical messages logged per time window, by default only those arriving at sinks.
+
+        Args:
+            window: Length of a time window
+            module_type: Only count messages logged by modules of this type, all messages if None
+        """
+        if self.messages.empty:
+            return pd.Series(dtype=float)
+        mask = np.ones(len(self.messages), dtype=bool) if module_type is None else (self.messages["module_type"] == module_type).to_numpy()
+        bins = (self.column("time").to_numpy()[mask] // window).astype(np.int64)
+        counts = np.bincount(bins, weights=self.messages["count"].to_numpy()[mask])
+        return pd.Series(counts, index=pd.Index(np.arange(len(counts)) * window, name="time"), name="throughput")
+
+    def utilization(self, node: Any, total_time: float) -> float:
+        """Fraction of *total_time* the node spent processing operators, summed over all cores"""
+        processing = self.messages["operator_processing"].to_numpy()
+        mask = (self.messages["node"] == node).to_numpy() & ~np.isnan(processing)
+        return processing[mask].sum() / total_time
+
+    def summary(self) -> Dict[str, float]:
+        """Returns the key figures of `print_report` as a flat dictionary"""
+        result = {"messages": self.count_messages(), "bytes": self.bytes_transmitted()}
+        means = self.messages[self.TIMES].mean() if not self.messages.empty else pd.Series(np.nan, index=self.TIMES)
+        result["message_time"] = means.sum(min_count=1)
+        result.update({column: means[column] for column in self.TIMES})
+        end_to_end = self.column("end_to_end_latency").dropna() if not self.messages.empty else pd.Series(dtype=float)
+        for q, value in zip(self.PERCENTILES, self._quantiles(end_to_end, self.PERCENTILES)):
+            result[f"end_to_end_p{q * 100:g}"] = value
+        result["end_to_end_max"] = end_to_end.max()
+        return result
 
     def times(self, time, value="mean"):
-        return self.messages.groupby("message").agg({time: value})
+        return self.messages.groupby("message", observed=True).agg({time: value})
 
-    def message_stats(self):
-        resp_msg = self.messages.groupby("message").agg({"time_total_response": ["count", "mean"]})
-        resp_msg.columns = resp_msg.columns.droplevel(0)
-        return resp_msg
+    def message_stats(self) -> pd.DataFrame:
+        """Number of logical messages and their mean latency per message type"""
+        latency = self.column("latency")
+        grouped = self.messages.assign(weighted_latency=latency * self.messages["count"]).groupby("message", observed=True)
+        result = grouped[["count", "weighted_latency"]].sum()
+        result["mean_latency"] = result.pop("weighted_latency") / result["count"]
+        return result
 
     def print_report(self, total_time):
         print("\n------------ RESULTS ------------")
@@ -80,39 +526,30 @@ class Stats:
 
         if self.messages.empty:
             return
-        means = self.messages[["network_queue", "network_latency", "operator_queue", "operator_processing"]].mean()
+        means = self.messages[self.TIMES].mean()
         print(f"Average message time:  {sum(means):.3f}")
         print(f"- network queue:       {means['network_queue']:.3f}")
         print(f"- network latency:     {means['network_latency']:.3f}")
         print(f"- operator queue:      {means['operator_queue']:.3f}")
         print(f"- operator processing: {means['operator_processing']:.3f}")
 
-    def average_messages_not_transmitted(self):
-        return np.mean(self.transmission.buffer)
-
-    def peak_messages_not_transmitted(self):
-        return np.max(self.transmission.buffer)
-
-    def messages_not_transmitted(self):
-        return self.transmission.buffer[-1:]
+        end_to_end = self.column("end_to_end_latency").dropna()
+        if not end_to_end.empty:
+            p50, p95, p99 = self._quantiles(end_to_end, self.PERCENTILES)
+            print()
+            print(f"End-to-end latency:    p50 {p50:.3f}  p95 {p95:.3f}  p99 {p99:.3f}  max {end_to_end.max():.3f}")
 
-    def get_df_modules(self):
-        g = self.messages.groupby(["module", "DES.dst"]).agg({"service": ["mean", "sum", "count"]})
+    def get_df_modules(self) -> pd.DataFrame:
+        """Mean, total and count of processing times per operator and node"""
+        operators = self.messages[self.messages["module_type"] == "Operator"]
+        g = operators.groupby(["module_name", "node"], observed=True, sort=False).agg({"operator_processing": ["mean", "sum", "count"]})
         return g.reset_index()
 
-    def get_df_service_utilization(self, service, time):
-        """Returns the utilization(%) of a specific module"""
-        g = self.messages.groupby(["module", "DES.dst"]).agg({"service": ["mean", "sum", "count"]})
-        g.reset_index(inplace=True)
-        h = pd.DataFrame()
-        h["module"] = g[g.module == service].module
-        h["utilization"] = g[g.module == service]["service"]["sum"] * 100 / time
-        return h
-
-
-def _load_csv(directory: str, filename: str) -> List[Dict]:
-    with open(os.path.join(directory, filename)) as f:
-        return [dict(row) for row in csv.DictReader(f)]
+    def get_df_service_utilization(self, service: str, time: float) -> pd.DataFrame:
+        """Returns the utilization(%) of a specific module per node"""
+        operators = self.messages[self.messages["module_name"] == service]
+        g = operators.groupby("node", observed=True, sort=False)["operator_processing"].sum()
+        return pd.DataFrame({"module": service, "node": g.index, "utilization": g.to_numpy() * 100 / time})
 
 
 def _write_csv(directory: str, filename: str, content: List[Dict]) -> None:
@@ -124,3 +561,47 @@ def _write_csv(directory: str, filename: str, content: List[Dict]) -> None:
         writer = csv.DictWriter(f, fieldnames=content[0].keys())
         writer.writeheader()
         writer.writerows(content)
+
+
+def _stem(filename: str) -> str:
+    return os.path.splitext(filename)[0]
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Writing Parquet or Arrow IPC files requires pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def _write_arrow(df: pd.DataFrame, file_path: str, file_format: str) -> None:
+    pa = _import_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, file_path)
+    else:
+        with pa.OSFile(file_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _read_batches(files: List[str], file_format: str, chunk_size: Optional[int]) -> Iterator[pd.DataFrame]:
+    pa = _import_pyarrow()
+    for file_path in files:
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(file_path)
+            if chunk_size is None:
+                yield parquet_file.read().to_pandas()
+            else:
+                for batch in parquet_file.iter_batches(batch_size=chunk_size):
+                    yield batch.to_pandas()
+        else:
+            with pa.memory_map(file_path) as source:
+                table = pa.ipc.open_file(source).read_all()
+            if chunk_size is None:
+                yield table.to_pandas()
+            else:
+                for batch in table.to_batches(max_chunksize=chunk_size):
+                    yield batch.to_pandas()
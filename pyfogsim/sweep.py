@@ -0,0 +1,85 @@
+"""Runs a grid of experiment configurations in parallel and combines their results in a single table."""
+
+import json
+import logging
+import os
+from itertools import product
+from multiprocessing import Pool
+from typing import NamedTuple, Type, List, Dict, Callable, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from pyfogsim.placement import Placement
+
+logger = logging.getLogger(__name__)
+
+
+class SweepConfig(NamedTuple):
+    n_sensors: int
+    placement: Type[Placement]
+    seed: int
+    simulated_time: int
+
+    @property
+    def key(self) -> str:
+        """Unique name of the configuration, used as file name for its results"""
+        return f"{self.n_sensors}_sensors-{self.placement.__name__}-seed_{self.seed}-{self.simulated_time}"
+
+    def to_dict(self) -> Dict:
+        return {"n_sensors": self.n_sensors, "placement": self.placement.__name__, "seed": self.seed, "simulated_time": self.simulated_time}
+
+
+def sweep_grid(
+    n_sensors: Iterable[int], placements: Iterable[Type[Placement]], seeds: Iterable[int], simulated_times: Iterable[int]
+) -> List[SweepConfig]:
+    """Returns the cartesian product of all parameters"""
+    return [SweepConfig(*values) for values in product(n_sensors, placements, seeds, simulated_times)]
+
+
+def run_sweep(
+    configs: List[SweepConfig], experiment: Callable[[SweepConfig], Dict], out_dir: str = "sweep", processes: Optional[int] = None
+) -> pd.DataFrame:
+    """Runs *experiment* for every configuration in a process pool and returns the combined results.
+
+    The results of every configuration are stored in *out_dir* as soon as it finished. Configurations with existing results
+    are skipped, so an interrupted sweep can be resumed by running it again.
+
+    Args:
+        configs: Configurations to run
+        experiment: Function which runs a single configuration and returns a flat dictionary of results, e.g. `Stats.summary()`.
+            Must be picklable, i.e. defined at module level.
+        out_dir: Directory for the results
+        processes: Number of worker processes, defaults to the number of CPUs
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    pending = [config for config in configs if not os.path.exists(_result_path(out_dir, config))]
+    logger.info(f"Running {len(pending)} of {len(configs)} configurations ({len(configs) - len(pending)} already finished).")
+    if pending:
+        with Pool(processes) as pool:
+            for config, result in pool.imap_unordered(_run_config, [(experiment, config) for config in pending]):
+                _write_result(out_dir, config, result)
+                logger.info(f"Finished {config.key}.")
+
+    rows = []
+    for config in configs:
+        with open(_result_path(out_dir, config)) as f:
+            rows.append({**config.to_dict(), **json.load(f)})
+    results = pd.DataFrame(rows)
+    results.to_csv(os.path.join(out_dir, "results.csv"), index=False)
+    return results
+
+
+def _run_config(args: Tuple[Callable[[SweepConfig], Dict], SweepConfig]) -> Tuple[SweepConfig, Dict]:
+    experiment, config = args
+    return config, experiment(config)
+
+
+def _result_path(out_dir: str, config: SweepConfig) -> str:
+    return os.path.join(out_dir, f"{config.key}.json")
+
+
+def _write_result(out_dir: str, config: SweepConfig, result: Dict) -> None:
+    path = _result_path(out_dir, config)
+    with open(path + ".tmp", "w") as f:
+        json.dump({key: float(value) for key, value in result.items()}, f)
+    os.replace(path + ".tmp", path)  # Atomic, an interrupted sweep never leaves partial results
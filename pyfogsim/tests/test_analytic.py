@@ -0,0 +1,60 @@
+import networkx as nx
+import pytest
+
+from pyfogsim.analytic import QueueingModel
+from pyfogsim.application import Application, Message, Operator, Sink, Source
+from pyfogsim.core import Simulation
+from pyfogsim.distribution import NumpyExponentialDistribution
+from pyfogsim.placement import CloudPlacement
+from pyfogsim.resource import Cloud, Link, Sensor
+from pyfogsim.selection import ShortestPath
+
+MEAN_INTER_ARRIVAL_TIME = 10
+LINK_SERVICE = 2  # Latency 1 plus 1000 bytes at 1000 bytes per time unit
+NODE_SERVICE = 5  # 1000 instructions at 200 instructions per time unit
+
+
+def m_d_1_waiting_time(rate: float, service: float) -> float:
+    """Mean waiting time of an M/D/1 queue (Pollaczek-Khinchine)"""
+    utilization = rate * service
+    return utilization * service / (2 * (1 - utilization))
+
+
+def build(bandwidth: int = 1000, latency: int = 1) -> Simulation:
+    sensor, cloud = Sensor("sensor"), Cloud("cloud")
+    G = nx.Graph()
+    G.add_edge(sensor, cloud, link=Link(bandwidth=bandwidth, latency=latency, watt_idle=0, watt_load=0))
+    simulation = Simulation(G, selection=ShortestPath(routing_table=True))
+    sink = Sink("sink", node=cloud)
+    operator = Operator("operator", message_out=Message("operator->sink", dst=sink, instructions=0, size=0))
+    message = Message("source->operator", dst=operator, instructions=1000, size=1000)
+    source = Source("source", node=sensor, message_out=message, distribution=NumpyExponentialDistribution(MEAN_INTER_ARRIVAL_TIME, seed=0))
+    simulation.deploy_app(Application("app", source=source, operators=[operator], sink=sink))
+    return simulation
+
+
+def test_queueing_model_matches_m_d_1_formulas():
+    simulation = build()
+    model = QueueingModel(simulation, total_time=1000, placement=CloudPlacement(simulation.apps))
+    rate = 1 / MEAN_INTER_ARRIVAL_TIME
+    assert model.link_usage().iloc[0] == pytest.approx(rate * LINK_SERVICE)
+    assert model.node_usage()[simulation.apps[0].sink.node] == pytest.approx(rate * NODE_SERVICE)
+    means = model.means()
+    assert means["network_latency"] == pytest.approx(LINK_SERVICE / 2)  # The message to the co-located sink has no hops
+    assert means["network_queue"] == pytest.approx(m_d_1_waiting_time(rate, LINK_SERVICE) / 2)
+    assert means["operator_processing"] == pytest.approx(NODE_SERVICE)
+    assert means["operator_queue"] == pytest.approx(m_d_1_waiting_time(rate, NODE_SERVICE))
+    assert model.count_messages() == pytest.approx(2 * 1000 * rate)
+
+
+def test_queueing_model_agrees_with_simulation():
+    # A busy link smooths the arrivals at the node, which the model ignores. Without it, the node is a true M/D/1 queue.
+    simulation = build(bandwidth=10 ** 6, latency=0)
+    placement = CloudPlacement(simulation.apps)
+    model = QueueingModel(simulation, total_time=50_000, placement=placement)
+    simulation.deploy_placement(placement)
+    simulation.run(until=50_000, progress_bar=False, fast=True)
+    expected, actual = model.summary(), simulation.stats.summary()
+    assert actual["messages"] == pytest.approx(expected["messages"], rel=0.05)
+    for time in ("operator_queue", "operator_processing"):
+        assert actual[time] == pytest.approx(expected[time], rel=0.1)
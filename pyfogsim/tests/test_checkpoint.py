@@ -0,0 +1,122 @@
+import functools
+import random
+
+import pandas as pd
+import pytest
+
+from pyfogsim.core import Simulation
+from pyfogsim.placement import CloudPlacement, EdgePlacement
+from pyfogsim.resource import FifoScheduler, FluidSharing, PriorityScheduler, ProcessorSharingScheduler, QueueTrace, StoreAndForward
+from pyfogsim.stats import ColumnarEventLog, EventLog, StreamingEventLog
+from pyfogsim.tests.utils import build_simulation
+
+UNTIL = 3000
+INTERVAL = 1300  # The last checkpoint before UNTIL is written at 2600
+
+CASES = {
+    "list": (StoreAndForward, FifoScheduler, "list", CloudPlacement, False),
+    "columnar": (FluidSharing, ProcessorSharingScheduler, "columnar", EdgePlacement, True),
+    "csv": (StoreAndForward, PriorityScheduler, "csv", EdgePlacement, True),
+    "parquet": (FluidSharing, FifoScheduler, "parquet", CloudPlacement, True),
+    "arrow": (StoreAndForward, ProcessorSharingScheduler, "arrow", EdgePlacement, False),
+}
+
+
+def event_log_factory(kind: str, path: str, overwrite: bool = True):
+    if kind == "list":
+        return EventLog
+    if kind == "columnar":
+        return ColumnarEventLog
+    return lambda: StreamingEventLog(path, batch_size=50, file_format=kind, overwrite=overwrite)
+
+
+def build(case, path: str, overwrite: bool = True) -> Simulation:
+    link_model, scheduler, event_log, placement, batching = case
+    return build_simulation(
+        event_log=event_log_factory(event_log, path, overwrite),
+        placement=placement,
+        link_model=link_model,
+        scheduler=scheduler,
+        batching=batching,
+        queue_trace=functools.partial(QueueTrace, interval=50),
+    )
+
+
+def result(simulation: Simulation):
+    """Everything a run produces: the message log, the usage of all nodes and links, queue traces and path lengths"""
+    columns = ["app_name", "module_name", "node", "created", "network_queue", "network_latency", "operator_queue", "operator_processing",
+               "count", "batch_wait", "origin"]
+    messages = simulation.stats.messages[columns].astype({"app_name": str, "module_name": str, "node": str})
+    messages = messages.sort_values(columns).reset_index(drop=True)
+    usage = [node.usage for node in simulation.network] + [link.usage for *_, link in simulation.network.edges(data="link")]
+    traces = [list(trace) for trace in _traces(simulation)]
+    return messages, usage, traces, dict(simulation.path_lengths)
+
+
+def _traces(simulation: Simulation):
+    for node in simulation.network:
+        scheduler = node._scheduler
+        yield scheduler.resource.trace if hasattr(scheduler, "resource") else scheduler.capacity.trace
+
+
+def assert_same_result(actual, expected):
+    pd.testing.assert_frame_equal(actual[0], expected[0])
+    assert actual[1] == pytest.approx(expected[1], abs=1e-9)
+    assert actual[2:] == expected[2:]
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_resumed_run_is_identical_to_uninterrupted_run(case, tmp_path):
+    if case[2] in ("parquet", "arrow"):
+        pytest.importorskip("pyarrow")
+    checkpoint = str(tmp_path / "checkpoint.pkl")
+
+    reference = build(case, str(tmp_path / "reference"))
+    reference.run(until=UNTIL, progress_bar=False, fast=True)
+    expected = result(reference)
+
+    checkpointed = build(case, str(tmp_path / "run"))
+    checkpointed.run(until=UNTIL, progress_bar=False, fast=True, checkpoint_path=checkpoint, checkpoint_interval=INTERVAL)
+    assert_same_result(result(checkpointed), expected)
+
+    # Resumes from the checkpoint at 2600, a streamed log is truncated to the records written until then
+    resumed = build(case, str(tmp_path / "run"), overwrite=False)
+    random.seed(123)
+    resumed.restore(checkpoint)
+    assert resumed.env.now == 2600
+    resumed.run(until=UNTIL, progress_bar=False, fast=True)
+    assert_same_result(result(resumed), expected)
+
+
+def test_resumed_stepped_run_is_identical(tmp_path):
+    case = CASES["columnar"]
+    checkpoint = str(tmp_path / "checkpoint.pkl")
+    reference = build(case, str(tmp_path))
+    reference.run(until=1500, progress_bar=False)
+
+    checkpointed = build(case, str(tmp_path))
+    checkpointed.run(until=1500, progress_bar=False, checkpoint_path=checkpoint, checkpoint_interval=700)
+    resumed = build(case, str(tmp_path))
+    resumed.restore(checkpoint)
+    assert resumed.env.now == 1400
+    resumed.run(until=1500, progress_bar=False)
+    assert_same_result(result(resumed), result(reference))
+
+
+def test_restore_requires_a_fresh_simulation(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.pkl")
+    simulation = build(CASES["list"], str(tmp_path))
+    simulation.run(until=100, progress_bar=False)
+    simulation.checkpoint(checkpoint)
+    with pytest.raises(ValueError):
+        simulation.restore(checkpoint)
+
+
+def test_stepped_and_fast_mode_simulate_the_same_horizon(tmp_path):
+    results = []
+    for fast in (False, True):
+        simulation = build(CASES["columnar"], str(tmp_path / str(fast)))
+        simulation.run(until=1000, progress_bar=False, fast=fast)
+        assert simulation.env.now == 1000
+        results.append(result(simulation))
+    assert_same_result(*results)
@@ -0,0 +1,11 @@
+import pytest
+
+from pyfogsim.distribution import NumpyNormalDistribution
+
+
+@pytest.mark.parametrize("mu, std", [(10, 5), (1, 5), (0, 3), (-5, 2), (100, 1), (5, 0)])
+def test_normal_distribution_mean_is_the_mean_of_the_clipped_samples(mu, std):
+    distribution = NumpyNormalDistribution(mu, std, seed=0)
+    samples = distribution._draw(10 ** 6)
+    assert distribution.mean == pytest.approx(samples.mean(), abs=5 * std / 10 ** 3 + 1e-9)
+    assert distribution.mean >= max(mu, 0)
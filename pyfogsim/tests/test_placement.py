@@ -0,0 +1,113 @@
+import random
+from types import SimpleNamespace
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from pyfogsim.application import Application, Message, Operator, Sink, Source
+from pyfogsim.distribution import DeterministicDistribution
+from pyfogsim.placement import CapacityIndex, EdgePlacement, LatencyModel
+from pyfogsim.resource import Cloud, Fog, LinkCable, Sensor
+from pyfogsim.tests.utils import build_simulation
+
+
+def test_capacity_index_skips_removed_nodes():
+    cloud, fogs = Cloud("cloud"), [Fog("fog0"), Fog("fog1")]
+    index = CapacityIndex([fogs[0], cloud, fogs[1]], key="ipt")
+    assert index.best() is cloud
+    index.remove(cloud)
+    assert len(index) == 2
+    assert index.best() is fogs[0]  # Ties are broken by order
+    index.remove(fogs[0])
+    assert index.best() is fogs[1]
+
+
+def test_capacity_index_skips_nodes_with_exhausted_ram():
+    cloud, fog = Cloud("cloud"), Fog("fog")
+    index = CapacityIndex([cloud, fog], key="ipt")
+    index.allocate(cloud, cloud.ram - 1000)
+    assert index.best(ram=1000) is cloud
+    assert index.best(ram=2000) is fog
+    assert index.best() is cloud  # Skipped nodes are still indexed
+    index.allocate(fog, fog.ram)
+    with pytest.raises(ValueError):
+        index.best(ram=2000)
+
+
+def test_capacity_index_by_remaining_ram_skips_outdated_entries():
+    fogs = [Fog(f"fog{i}") for i in range(3)]
+    index = CapacityIndex(fogs, key="remaining_ram")
+    placed = []
+    for _ in range(6):
+        node = index.best(ram=1500)
+        index.allocate(node, 1500)
+        placed.append(node)
+    assert placed == fogs + fogs  # Round robin, every allocation makes the node less preferred
+    assert all(index.remaining_ram[fog] == 1000 for fog in fogs)
+    with pytest.raises(ValueError):
+        index.best(ram=1500)
+
+
+def _tree_apps(n_nodes: int = 40, n_apps: int = 30, n_operators: int = 1, seed: int = 0):
+    """Random tree, so all shortest paths are unique, with apps between random nodes"""
+    rng = random.Random(seed)
+    nodes = [Cloud("cloud")] + [Fog(f"fog{i}") for i in range(1, n_nodes)]
+    G = nx.Graph()
+    for i, node in enumerate(nodes[1:], start=1):
+        G.add_edge(node, nodes[rng.randrange(i)], link=LinkCable())
+    apps = []
+    for i in range(n_apps):
+        source, sink = rng.sample(nodes, 2)
+        module = Sink(f"App{i}:sink", node=sink)
+        operators = []
+        for j in reversed(range(n_operators)):
+            message = Message(f"App{i}:operator{j}->", dst=module, instructions=rng.randint(100, 1000), size=rng.randint(10, 1000))
+            module = Operator(f"App{i}:operator{j}", message_out=message)
+            operators.insert(0, module)
+        message = Message(f"App{i}:source->", dst=module, instructions=rng.randint(100, 1000), size=rng.randint(10, 1000))
+        source = Source(f"App{i}:source", node=source, message_out=message, distribution=DeterministicDistribution(rng.uniform(50, 500)))
+        apps.append(Application(name=f"App{i}", source=source, operators=operators, sink=operators[-1].message_out.dst))
+    return G, apps
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_bulk_edge_placement_finds_the_same_first_hops(seed):
+    G, apps = _tree_apps(seed=seed)
+    simulation = SimpleNamespace(network=G)
+    placed = []
+    for bulk in (False, True):
+        EdgePlacement(apps, bulk=bulk)._run(simulation)
+        placed.append([app.operators[0].node for app in apps])
+    assert placed[0] == placed[1]
+    assert all(G.has_edge(app.source.node, node) for app, node in zip(apps, placed[1]))
+
+
+def _latency_model(seed: int = 0) -> LatencyModel:
+    simulation = build_simulation(sensors=12, seed=seed)
+    candidates = [node for node in simulation.network if not isinstance(node, Sensor)]
+    return LatencyModel(simulation.network, simulation.apps, candidates, max_utilization=0.9)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_anneal_improves_the_greedy_placement(seed):
+    model = _latency_model(seed)
+    greedy = model.greedy()
+    annealed = model.anneal(greedy, iterations=200, seed=seed)
+    assert model.feasible(greedy) and model.feasible(annealed)
+    assert model.cost(annealed) <= model.cost(greedy)
+
+
+def test_move_deltas_match_the_exact_cost_change():
+    """Annealing accepts moves by their estimated cost change, which has to match the cost of the resulting placement"""
+    G, apps = _tree_apps(n_apps=10, n_operators=3)
+    model = LatencyModel(G, apps, list(G))
+    rng = np.random.default_rng(0)
+    x = model.greedy()
+    operators = np.arange(len(model))
+    new = (x + rng.integers(1, len(model.candidates), size=len(model))) % len(model.candidates)  # Only actual moves
+    deltas = model._move_delta(x, operators, x[operators], new)
+    for o, delta in zip(operators, deltas):
+        moved = x.copy()
+        moved[o] = new[o]
+        assert delta == pytest.approx(model.cost(moved) - model.cost(x), rel=1e-9, abs=1e-6)
@@ -0,0 +1,130 @@
+from typing import List, Tuple
+
+import simpy
+import pytest
+
+from pyfogsim.resource import MonitoredResource, QueueTrace, SharedCapacity
+
+
+def run_to_end(env: simpy.Environment) -> int:
+    """Runs the simulation until no events are left and returns the number of processed events"""
+    events = 0
+    while env.peek() < float("inf"):
+        env.step()
+        events += 1
+    return events
+
+
+def completion_times(jobs: List[Tuple[float, float]], rate: float = 1, servers: int = 1) -> List[float]:
+    """Submits jobs of (arrival time, work) to a `SharedCapacity` and returns their completion times"""
+    env = simpy.Environment()
+    capacity = SharedCapacity(env, rate=rate, servers=servers)
+    finished = [None] * len(jobs)
+
+    def submit(i, arrival, work):
+        yield env.timeout(arrival)
+        yield capacity.process(work)
+        finished[i] = env.now
+
+    for i, (arrival, work) in enumerate(jobs):
+        env.process(submit(i, arrival, work))
+    env.run()
+    return finished
+
+
+@pytest.mark.parametrize("jobs, rate, servers, expected", [
+    ([(0, 4)], 2, 1, [2]),
+    ([(0, 4), (0, 4)], 1, 1, [8, 8]),
+    ([(0, 4), (2, 4)], 1, 1, [6, 8]),  # Both at half rate from 2 to 6, then the second alone
+    ([(0, 6), (0, 6), (0, 6)], 1, 2, [9, 9, 9]),  # Each job gets 2/3 of a server
+    ([(0, 6), (0, 2)], 1, 2, [6, 2]),  # Jobs never get more than one server
+    ([(0, 0), (1, 3)], 1, 1, [0, 4]),
+], ids=["single", "simultaneous", "overlapping", "more jobs than servers", "fewer jobs than servers", "no work"])
+def test_shared_capacity_completion_times(jobs, rate, servers, expected):
+    assert completion_times(jobs, rate, servers) == pytest.approx(expected)
+
+
+def test_shared_capacity_remaining_work_and_usage():
+    env = simpy.Environment()
+    capacity = SharedCapacity(env, rate=1, servers=2)
+    first, second, third = capacity.process(3), capacity.process(6), capacity.process(9)
+    env.run(until=3)
+    # Three jobs share two servers, so each job has received 2 units of work
+    assert list(capacity.remaining_work().values()) == pytest.approx([1, 4, 7])
+    assert list(capacity.remaining_work()) == [first, second, third]
+    env.run()
+    # The first job finishes at 4.5, the second (3 units left) at 7.5 and the third (3 units left) alone at 10.5
+    assert env.now == pytest.approx(10.5)
+    assert capacity.usage == pytest.approx((2 * 7.5 + 3) / (2 * 10.5))
+
+
+def test_shared_capacity_keeps_one_pending_completion():
+    env = simpy.Environment()
+    capacity = SharedCapacity(env, rate=10, servers=2)
+    n = 1000
+
+    def submit():
+        for i in range(n):
+            capacity.process(1000 + (i * 37) % 500)
+            yield env.timeout(5)
+
+    env.process(submit())
+    events = run_to_end(env)
+    # Process start, n arrivals, n job events and at most one completion check per job plus a few rescheduled checks
+    assert len(capacity) == 0
+    assert events <= 1 + 3 * n + n // 100
+
+
+def test_shared_capacity_short_arrival_overtakes_pending_completion():
+    env = simpy.Environment()
+    capacity = SharedCapacity(env, rate=1)
+    finished = {}
+    long = capacity.process(10)
+    long.callbacks.append(lambda _: finished.setdefault("long", env.now))
+
+    def arrive():
+        yield env.timeout(1)
+        short = capacity.process(1)
+        short.callbacks.append(lambda _: finished.setdefault("short", env.now))
+
+    env.process(arrive())
+    env.run()
+    # The short job gets half the rate from t=1, the long job has 8 units left when it is alone again
+    assert finished["short"] == pytest.approx(3)
+    assert finished["long"] == pytest.approx(11)
+
+
+def test_queue_trace_samples_piecewise_constant_queue():
+    env = simpy.Environment()
+    trace = QueueTrace(interval=1)
+    resource = MonitoredResource(env, trace=trace)
+
+    def hold(arrival):
+        yield env.timeout(arrival)
+        with resource.request() as request:
+            yield request
+            yield env.timeout(10)
+
+    env.process(hold(0))
+    for _ in range(3):
+        env.process(hold(2))
+    env.run()
+    # One user holds the resource during [0, 10), three more arrive at 2 and are served one after another
+    expected = [0] * 2 + [3] * 8 + [2] * 10 + [1] * 10 + [0] * 10
+    assert list(trace) == list(enumerate(expected))
+
+
+def test_queue_trace_of_shared_capacity():
+    env = simpy.Environment()
+    trace = QueueTrace(interval=1)
+    capacity = SharedCapacity(env, rate=1, trace=trace)
+
+    def submit(arrival, work):
+        yield env.timeout(arrival)
+        yield capacity.process(work)
+
+    env.process(submit(0, 2))
+    env.process(submit(1, 3))
+    env.run()
+    # The jobs share the rate during [1, 3), the first finishes at 3 and the second at 5
+    assert list(trace) == [(0, 1), (1, 2), (2, 2), (3, 1), (4, 1)]
@@ -0,0 +1,50 @@
+import networkx as nx
+import pytest
+
+from pyfogsim.application import Message, MessageInstance
+from pyfogsim.resource import Cloud, Fog, Link4G, LinkCable, Sensor
+from pyfogsim.selection import CongestionAwareRouting, DeviceSpeedAwareRouting, RandomPath, ShortestPath
+from pyfogsim.tests.utils import build_simulation
+
+SELECTIONS = {
+    "shortest path": lambda: ShortestPath(routing_table=True),
+    "random path": lambda: RandomPath(k=1),
+    "device speed aware": DeviceSpeedAwareRouting,
+    "congestion aware": CongestionAwareRouting,
+}
+
+
+@pytest.mark.parametrize("selection", SELECTIONS.values(), ids=SELECTIONS.keys())
+def test_routing_tables_are_invalidated_by_update(selection):
+    """Routing tables do not watch the network, paths only change after `update()`"""
+    sensor, fogs, cloud = Sensor("sensor"), [Fog("fog0"), Fog("fog1")], Cloud("cloud")
+    G = nx.Graph()
+    G.add_edge(sensor, fogs[0], link=Link4G())
+    G.add_edge(fogs[0], fogs[1], link=LinkCable())
+    G.add_edge(fogs[1], cloud, link=LinkCable())
+    message = MessageInstance(Message("message", dst=None, size=100), created=0, application=None)
+    selection = selection()
+    selection.update(G, [])
+    assert selection.get_path(G, message, sensor, cloud) == [sensor, fogs[0], fogs[1], cloud]
+
+    G.add_edge(fogs[0], cloud, link=LinkCable())
+    assert selection.get_path(G, message, sensor, cloud) == [sensor, fogs[0], fogs[1], cloud]  # Cached
+    selection.update(G, [])
+    assert selection.get_path(G, message, sensor, cloud) == [sensor, fogs[0], cloud]
+
+
+def test_simulation_topology_changes_update_routing_tables():
+    simulation = build_simulation(selection=ShortestPath(routing_table=True), sensors=2)
+    simulation.run(until=500, progress_bar=False)
+    G, app = simulation.network, simulation.apps[0]
+    sensor, cloud = app.source.node, app.sink.node
+    message = MessageInstance(app.source.message_out, created=500, application=app)
+    assert len(simulation.selection.get_path(G, message, sensor, cloud)) == 3
+
+    simulation.add_link(sensor, cloud, LinkCable())
+    assert simulation.selection.get_path(G, message, sensor, cloud) == [sensor, cloud]
+    simulation.run(until=1000, progress_bar=False)
+    assert G.edges[sensor, cloud]["link"].usage > 0
+
+    simulation.remove_link(sensor, cloud)
+    assert len(simulation.selection.get_path(G, message, sensor, cloud)) == 3
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyfogsim.application import MessageInstance
+from pyfogsim.stats import ColumnarEventLog, EventLog, Stats, StreamingEventLog
+from pyfogsim.tests.utils import build_simulation
+
+EVENT_LOGS = [EventLog, ColumnarEventLog]
+
+
+@pytest.fixture(scope="module", params=EVENT_LOGS, ids=lambda log: log.__name__)
+def stats(request) -> Stats:
+    simulation = build_simulation(event_log=request.param)
+    simulation.run(until=1000, progress_bar=False)
+    return simulation.stats
+
+
+def by_node(df: pd.DataFrame) -> pd.DataFrame:
+    """Groups are not sorted, so results are compared by node name"""
+    df = df.copy()
+    df.index = pd.Index([str(node) for node in df.index], name="node")
+    return df.sort_index()
+
+
+def test_operators_run_on_several_nodes(stats):
+    assert stats.messages.loc[stats.messages["module_type"] == "Operator", "node"].nunique() > 1
+
+
+def test_get_df_modules(stats):
+    df = stats.get_df_modules()
+    assert len(df) == stats.messages.loc[stats.messages["module_type"] == "Operator", "module_name"].nunique()
+    assert df[("operator_processing", "count")].sum() == (stats.messages["module_type"] == "Operator").sum()
+
+
+def test_latency_percentiles_by_node(stats):
+    df = stats.latency_percentiles(by="node", latency="latency")
+    assert list(df.columns) == ["count", "mean", "p50", "p95", "p99", "max"]
+    assert df["count"].sum() == len(stats.messages)
+    assert (df["p50"] <= df["p99"]).all() and (df["p99"] <= df["max"]).all()
+
+
+def test_latency_percentiles_weight_batches_by_count():
+    simulation = build_simulation(batching=True)
+    simulation.run(until=2000, progress_bar=False)
+    stats = simulation.stats
+    df = stats.latency_percentiles(by="app_name", latency="latency")
+    assert df["count"].sum() == stats.count_messages() > len(stats.messages)
+    for app, group in stats.messages.groupby("app_name", observed=True):
+        logical = np.repeat(stats.column("latency")[group.index].to_numpy(dtype=float), group["count"].to_numpy())
+        expected = [len(logical), logical.mean(), *np.quantile(logical, stats.PERCENTILES), logical.max()]
+        assert df.loc[app].to_numpy(dtype=float) == pytest.approx(expected)
+
+
+def test_get_df_service_utilization(stats):
+    service = stats.messages.loc[stats.messages["module_type"] == "Operator", "module_name"].iloc[0]
+    df = stats.get_df_service_utilization(service, 1000)
+    assert (df["utilization"] > 0).all()
+
+
+def test_grouping_is_independent_of_the_event_log():
+    results = []
+    for event_log in EVENT_LOGS:
+        simulation = build_simulation(event_log=event_log)
+        simulation.run(until=1000, progress_bar=False)
+        results.append(by_node(simulation.stats.latency_percentiles(by="node", latency="latency")))
+    pd.testing.assert_frame_equal(*results)
+
+
+@pytest.mark.parametrize("event_log", EVENT_LOGS, ids=lambda log: log.__name__)
+def test_latency_percentiles_of_empty_log(event_log):
+    df = Stats(event_log()).latency_percentiles()
+    assert df.empty
+    assert list(df.columns) == ["count", "mean", "p50", "p95", "p99", "max"]
+
+
+@pytest.mark.parametrize("event_log", EVENT_LOGS, ids=lambda log: log.__name__)
+def test_loaded_log_is_numeric(event_log, tmp_path):
+    simulation = build_simulation(event_log=event_log, batching=True)
+    simulation.run(until=1000, progress_bar=False)
+    simulation.event_log.write(str(tmp_path))
+
+    loaded = event_log()
+    loaded.load(str(tmp_path))
+    expected, actual = simulation.stats.summary(), Stats(loaded).summary()
+    assert actual["messages"] == expected["messages"] > len(loaded)  # Batches count as their number of messages
+    assert actual["bytes"] == expected["bytes"]
+    assert actual == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("event_log", EVENT_LOGS, ids=lambda log: log.__name__)
+def test_log_without_count_column(event_log, tmp_path):
+    simulation = build_simulation()
+    simulation.run(until=1000, progress_bar=False)
+    simulation.event_log.write(str(tmp_path))
+    old_log = pd.read_csv(tmp_path / EventLog.MESSAGE_LOG_FILE).drop(columns=["count", "batch_wait", "origin"])
+    old_log.to_csv(tmp_path / EventLog.MESSAGE_LOG_FILE, index=False)
+
+    loaded = event_log()
+    loaded.load(str(tmp_path))
+    stats = Stats(loaded)
+    assert stats.count_messages() == len(old_log)
+    assert stats.bytes_transmitted() == old_log["size"].sum()
+
+
+@pytest.mark.parametrize("file_format", StreamingEventLog.FORMATS)
+def test_streaming_event_log_load(file_format, tmp_path):
+    if file_format != "csv":
+        pytest.importorskip("pyarrow")
+    path, copy_path = str(tmp_path / "log"), str(tmp_path / "copy")
+    simulation = build_simulation(event_log=lambda: StreamingEventLog(path, batch_size=50, file_format=file_format))
+    simulation.run(until=1000, progress_bar=False)
+    expected = simulation.stats.summary()
+
+    resumed = StreamingEventLog(path, batch_size=50, file_format=file_format, overwrite=False)
+    resumed.load(path)
+    copied = StreamingEventLog(copy_path, batch_size=40, file_format=file_format)
+    copied.load(path)
+    for log in (resumed, copied):
+        assert len(log) == len(simulation.event_log)
+        assert Stats(log).summary() == expected
+        assert len(log.message_log) == len(simulation.event_log)
+
+    app = simulation.apps[0]
+    resumed.append(app, app.sink, MessageInstance(app.operators[0].message_out, created=1000, application=app))
+    resumed.flush()
+    assert sum(len(chunk) for chunk in EventLog.load_chunks(path)) == len(simulation.event_log) + 1
+
+
+def test_columnar_event_log_matches_event_log_across_blocks():
+    event_log, columnar = EventLog(), ColumnarEventLog(capacity=1)
+    simulation = build_simulation(sensors=2)
+    simulation.run(until=100, progress_bar=False)  # Places the operators
+    app = simulation.apps[0]
+    for i in range(3 * ColumnarEventLog.BLOCK_SIZE + 1):
+        message = MessageInstance(app.operators[0].message_out, created=float(i), application=app)
+        message.network_queue = i / 2
+        module = app.sink if i % 3 else app.operators[0]
+        for log in (event_log, columnar):
+            log.append(app, module, message)
+    assert len(columnar) == len(event_log)
+    expected = event_log.to_dataframe()
+    actual = columnar.to_dataframe()
+    for column in ColumnarEventLog.CATEGORICAL_COLUMNS:
+        actual[column] = actual[column].astype(object)
+    pd.testing.assert_frame_equal(actual, expected)
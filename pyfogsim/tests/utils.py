@@ -0,0 +1,51 @@
+import random
+from typing import Callable, Optional, Type
+
+import networkx as nx
+
+from pyfogsim.application import Application, Batching, Message, Operator, Sink, Source
+from pyfogsim.core import Simulation
+from pyfogsim.distribution import DeterministicDistribution, NumpyExponentialDistribution, UniformDistribution
+from pyfogsim.placement import EdgePlacement, Placement
+from pyfogsim.resource import Cloud, FifoScheduler, Fog, Link4G, LinkCable, LinkModel, QueueTrace, Scheduler, Sensor, StoreAndForward
+from pyfogsim.selection import Selection, ShortestPath
+from pyfogsim.stats import EventLog
+
+
+def build_simulation(
+    event_log: Callable[[], EventLog] = EventLog,
+    placement: Type[Placement] = EdgePlacement,
+    link_model: Type[LinkModel] = StoreAndForward,
+    scheduler: Type[Scheduler] = FifoScheduler,
+    batching: bool = False,
+    queue_trace: Optional[Callable[[], QueueTrace]] = None,
+    selection: Optional[Selection] = None,
+    sensors: int = 6,
+    seed: int = 0,
+) -> Simulation:
+    """Small simulation of sensors connected to two fog nodes and a cloud, every sensor runs one sensor -> operator -> sink app"""
+    random.seed(seed)
+    G = nx.Graph()
+    cloud = Cloud("cloud", scheduler=scheduler, cores=2)
+    fogs = [Fog(f"fog{i}", scheduler=scheduler) for i in range(2)]
+    for fog in fogs:
+        G.add_edge(fog, cloud, link=LinkCable())
+    for i in range(sensors):
+        G.add_edge(Sensor(f"sensor{i}"), fogs[i % 2], link=Link4G())
+
+    simulation = Simulation(G, selection=selection or ShortestPath(), event_log=event_log(), queue_trace=queue_trace, link_model=link_model)
+    for i, sensor in enumerate(n for n in G if isinstance(n, Sensor)):
+        name = f"App{i}"
+        sink = Sink(f"{name}:sink", node=cloud)
+        operator = Operator(f"{name}:operator", message_out=Message(f"{name}:operator->sink", dst=sink, instructions=300, size=50))
+        distribution = UniformDistribution(5, 60) if i % 2 else NumpyExponentialDistribution(30, seed=seed + i)
+        source = Source(
+            f"{name}:source",
+            node=sensor,
+            message_out=Message(f"{name}:source->operator", dst=operator, instructions=30, size=1000),
+            distribution=distribution,
+            batching=Batching(max_size=3, window=40) if batching and i < sensors // 2 else None,
+        )
+        simulation.deploy_app(Application(name=name, source=source, operators=[operator], sink=sink, priority=i % 3))
+    simulation.deploy_placement(placement(simulation.apps, activation_dist=DeterministicDistribution(700)))
+    return simulation
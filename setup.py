@@ -11,4 +11,5 @@ setup(
     long_description=long_description,
     license="MIT License",
     install_requires=["simpy", "pandas", "networkx", "numpy", "tqdm"],
+    extras_require={"arrow": ["pyarrow"]},
 )